@@ -1,28 +1,348 @@
 import os
+import gzip
 import time
 import json
-import requests
-from flask import Flask, request, jsonify
+import hashlib
+import logging
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, Future
+from queue import Queue, Empty
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
-# Charger les variables d'environnement
+# Charger les variables d'environnement avant les modules locaux,
+# qui lisent leur configuration à l'import
 load_dotenv()
 
+from storage import create_store
+from http_client import post_json
+from assistant_runner import execute_run, get_assistant_reply
+from rate_limit import limiter, RateLimitedTransport
+from cache import TTLCache, PersistentCache, SingleFlight
+from prompt_budget import dedupe_similar, fit_to_budget, truncate_text
+from tool_outputs import project_tool_output
+from webhooks import WebhookDispatcher, callback_url_error, WEBHOOK_FAILED_TTL
+from logs import setup_logging, logging_stats, Payload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # compression br désactivée, gzip seulement
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Configuration OpenAI
 API_KEY = os.getenv("OPENAI_API_KEY")
 ASSISTANT_ID = "asst_4qIjf00E1XIYVvKV9GKAUzJp"  # ID de votre Assistant GPT
 REDACTEUR_ASSISTANT_ID = "asst_LlhjAq1OLjwswAf6sLgq4UF9"  # ID de l'Assistant Rédacteur SEO
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_openai_client = None
+_openai_client_pid = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """
+    Retourne le client OpenAI partagé du processus (créé à la première utilisation,
+    recréé après un fork de gunicorn) afin de réutiliser son pool de connexions.
+    """
+    global _openai_client, _openai_client_pid
+    if _openai_client is None or _openai_client_pid != os.getpid():
+        with _openai_client_lock:
+            if _openai_client is None or _openai_client_pid != os.getpid():
+                import httpx
+                from openai import OpenAI
+                
+                # Le transport applique le budget "openai" du limiteur de débit partagé
+                http_client = httpx.Client(
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                    transport=RateLimitedTransport(
+                        "openai",
+                        limits=httpx.Limits(
+                            max_connections=OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+                        )
+                    ),
+                    follow_redirects=True
+                )
+                _openai_client = OpenAI(
+                    api_key=API_KEY,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=http_client
+                )
+                _openai_client_pid = os.getpid()
+    return _openai_client
 
 app = Flask(__name__)
 
+def normalize_keyword(keyword):
+    """
+    Normalise un mot-clé pour les recherches (casse, espaces, forme Unicode).
+    """
+    return " ".join(unicodedata.normalize("NFC", str(keyword)).lower().split())
+
+# Stockage partagé des files d'attente (SQLite/WAL par défaut, voir storage.py)
+# Index secondaires : mot-clé normalisé -> briefs, brief_id -> contenus
+# Corps des briefs et articles terminés stockés compressés (body=...), décompressés à la lecture
+store = create_store()
+
 # Files d'attente pour les briefs
-pending_briefs = {}     # Format : {brief_id: {"keyword": keyword, "status": "pending", "created_at": timestamp}}
-completed_briefs = {}   # Format : {brief_id: {"keyword": keyword, "brief": brief, "status": "completed", "completed_at": timestamp}}
+pending_briefs = store.queue("pending_briefs", index="keyword", normalize=normalize_keyword)  # Format : {brief_id: {"keyword": keyword, "status": "pending", "created_at": timestamp}}
+completed_briefs = store.queue("completed_briefs", index="keyword", normalize=normalize_keyword, body="brief")  # Format : {brief_id: {"keyword": keyword, "brief": brief, "status": "completed", "completed_at": timestamp}}
 
 # Files d'attente pour les contenus
-pending_content = {}     # Format : {content_id: {"brief_id": brief_id, "status": "pending", "created_at": timestamp}}
-completed_content = {}   # Format : {content_id: {"brief_id": brief_id, "content": content, "status": "completed", "completed_at": timestamp}}
+pending_content = store.queue("pending_content", index="brief_id")  # Format : {content_id: {"brief_id": brief_id, "status": "pending", "created_at": timestamp}}
+completed_content = store.queue("completed_content", index="brief_id", body="content")  # Format : {content_id: {"brief_id": brief_id, "content": content, "status": "completed", "completed_at": timestamp}}
+
+# Traitements par lot (/processBatch)
+batches = store.queue("batches")  # Format : {batch_id: {"status": status, "brief_ids": [...], "results": {brief_id: outcome}, "started_at": timestamp}}
+
+# Notifications de fin de job vers la callback_url du job (voir webhooks.py)
+webhooks = WebhookDispatcher(store, store.queue("webhooks"), store.queue("webhooks_failed"))  # Format : {delivery_id: {"url": url, "event": event, "payload": {...}, "status": status, "attempts": n, "next_attempt_at": timestamp}}
+if len(webhooks.queue):
+    webhooks.start()  # envois restés en attente avant le redémarrage
+
+# Long-poll (wait=secondes) de /recupererBrief et /recupererContenu : la requête est réveillée
+# dès qu'un job se termine dans ce processus, et relit le store toutes les LONG_POLL_INTERVAL
+# secondes pour les jobs terminés par un autre worker
+LONG_POLL_MAX_WAIT = float(os.getenv("LONG_POLL_MAX_WAIT", "30"))
+LONG_POLL_INTERVAL = float(os.getenv("LONG_POLL_INTERVAL", "1"))
+job_events = threading.Condition()
+
+# Rétention des briefs et contenus terminés (0 = pas de limite) : au-delà des limites,
+# les plus anciens (RETENTION_POLICY=oldest) ou les moins récemment lus (lru) sont supprimés
+RETENTION_MAX_AGE = int(os.getenv("RETENTION_MAX_AGE", "0"))  # secondes
+RETENTION_MAX_ENTRIES = int(os.getenv("RETENTION_MAX_ENTRIES", "0"))  # par file
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))  # par file
+RETENTION_POLICY = os.getenv("RETENTION_POLICY", "oldest").lower()
+RETENTION_SWEEP_INTERVAL = int(os.getenv("RETENTION_SWEEP_INTERVAL", "300"))  # secondes, 0 = pas de nettoyage planifié
+TEMP_BRIEF_TTL = int(os.getenv("TEMP_BRIEF_TTL", "3600"))  # briefs temporaires (outil enregistrerBrief) orphelins
+retention_lock = threading.Lock()
+retention_counters = {"completed_briefs": 0, "completed_content": 0, "temp_briefs": 0, "failed_webhooks": 0, "sweeps": 0, "last_sweep_at": None}
+
+# Exécution en tâche de fond des générations (/process et /genererContenu)
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+BACKGROUND_QUEUE_SIZE = int(os.getenv("BACKGROUND_QUEUE_SIZE", "20"))  # jobs en attente d'un thread libre
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "1800"))  # secondes avant de considérer un job "processing" comme abandonné
+executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="job")
+background_slots = threading.BoundedSemaphore(BACKGROUND_WORKERS + BACKGROUND_QUEUE_SIZE)
+
+def add_job(queue, prefix, data, taken=()):
+    """
+    Ajoute un job avec un identifiant unique, même si plusieurs workers
+    créent un job dans la même seconde. `taken` liste les autres files où
+    l'identifiant ne doit pas non plus exister (un job passe de pending à completed).
+    """
+    base_id = f"{prefix}_{int(time.time())}"
+    job_id = base_id
+    suffix = 1
+    with store.transaction():
+        while any(job_id in other for other in taken) or not queue.add(job_id, data):
+            suffix += 1
+            job_id = f"{base_id}_{suffix}"
+    return job_id
+
+def job_claimable(data, allow_retry=False):
+    """
+    Vrai si le job peut être pris : "pending", "processing" abandonné
+    (depuis plus de JOB_STALE_AFTER secondes, worker redémarré ou tué), ou "failed" avec allow_retry.
+    """
+    status = data.get("status", "pending")
+    if status == "pending":
+        return True
+    if status == "processing":
+        return time.time() - data.get("started_at", 0) > JOB_STALE_AFTER
+    return allow_retry and status == "failed"
+
+def claim_job(queue, job_id, allow_retry=False):
+    """
+    Passe un job en "processing" de façon atomique (entre threads et entre workers).
+    Retourne les données du job, ou None s'il est déjà pris par un autre worker.
+    Un job "processing" depuis plus de JOB_STALE_AFTER secondes est repris.
+    """
+    with store.transaction():
+        data = queue.get(job_id)
+        if data is None:
+            return None
+        if not job_claimable(data, allow_retry):
+            return None
+        data["status"] = "processing"
+        data["started_at"] = time.time()
+        data.pop("error", None)
+        queue[job_id] = data
+        return data
+
+def restamp_job(queue, job_id, claimed_at):
+    """
+    Remet started_at à l'heure quand un job réclamé à l'avance (batch) démarre vraiment,
+    pour qu'il ne soit pas jugé abandonné pendant son attente dans le pool.
+    Retourne les données du job, ou None s'il a été repris ou terminé par un autre worker entre-temps.
+    """
+    with store.transaction():
+        data = queue.get(job_id)
+        if data is None or data.get("status") != "processing" or data.get("started_at") != claimed_at:
+            return None
+        data["started_at"] = time.time()
+        queue[job_id] = data
+        return data
+
+def next_pending_job(queue, retry_failed=False):
+    """
+    Retourne le premier job (job_id, data) à traiter : "pending" ou "processing" abandonné
+    (voir job_claimable), ou None.
+    Avec retry_failed, à défaut d'un tel job, retourne le plus ancien job en échec
+    (les jobs en attente passent avant les nouvelles tentatives).
+    """
+    failed = None
+    for job_id, data in queue.items():
+        if job_claimable(data):
+            return job_id, data
+        if data.get("status") == "failed" and failed is None:
+            failed = job_id, data
+    return failed if retry_failed else None
+
+def job_callback(kind, job_id, pending_data, payload):
+    """
+    Enregistre la notification de fin de job si une callback_url a été fournie
+    (à appeler dans la transaction qui termine le job). kind : "brief" ou "content".
+    """
+    url = (pending_data or {}).get("callback_url")
+    if url:
+        webhooks.enqueue(url, f"{kind}.{payload['status']}", {f"{kind}_id": job_id, **public_record(payload)})
+
+def notify_job_done():
+    """
+    Réveille les long-polls en attente et l'envoi des webhooks (après la transaction).
+    """
+    with job_events:
+        job_events.notify_all()
+    webhooks.wake()
+
+def mark_job_failed(queue, job_id, error):
+    """
+    Enregistre l'échec d'un job pour qu'il soit visible par les endpoints de récupération.
+    """
+    with store.transaction():
+        data = queue.get(job_id)
+        if data is not None:
+            data["status"] = "failed"
+            data["error"] = error
+            data["failed_at"] = time.time()
+            queue[job_id] = data
+            if queue is pending_briefs:
+                job_callback("brief", job_id, data, {"keyword": data["keyword"], "status": "failed", "error": error})
+            else:
+                job_callback("content", job_id, data, {"brief_id": data["brief_id"], "status": "failed", "error": error})
+    notify_job_done()
+
+def release_job(queue, job_id):
+    """
+    Remet un job réclamé au statut "pending" (ex : pool saturé).
+    """
+    with store.transaction():
+        data = queue.get(job_id)
+        if data is not None:
+            data["status"] = "pending"
+            data.pop("started_at", None)
+            queue[job_id] = data
+
+def long_poll_wait(args):
+    """
+    Durée d'attente demandée (paramètre wait, en secondes, plafonnée à LONG_POLL_MAX_WAIT).
+    Lève ValueError si le paramètre n'est pas un nombre.
+    """
+    wait = float(args.get('wait') or 0)
+    return max(0.0, min(wait, LONG_POLL_MAX_WAIT))
+
+def job_settled(pending_queue, completed_queue, job_id):
+    """
+    Vrai si le job est terminé, en échec ou inconnu (inutile d'attendre).
+    """
+    if job_id in completed_queue:
+        return True
+    pending_data = pending_queue.get(job_id)
+    return pending_data is None or pending_data.get("status") == "failed"
+
+def wait_for_job(pending_queue, completed_queue, job_id, wait):
+    """
+    Attend au plus wait secondes que le job se termine.
+    """
+    deadline = time.time() + wait
+    while not job_settled(pending_queue, completed_queue, job_id):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        with job_events:
+            job_events.wait(min(remaining, LONG_POLL_INTERVAL))
+
+def submit_background(fn, *args):
+    """
+    Soumet un job au pool de threads. Retourne False si le pool est saturé.
+    """
+    if not background_slots.acquire(blocking=False):
+        return False
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        background_slots.release()
+        raise
+    future.add_done_callback(lambda f: background_slots.release())
+    return True
+
+def sweep_retention():
+    """
+    Supprime les briefs temporaires orphelins et les webhooks en échec expirés, puis
+    applique la rétention aux briefs et contenus terminés. Retourne le nombre d'entrées
+    supprimées par file.
+    """
+    swept = {
+        "temp_briefs": completed_briefs.expire(TEMP_BRIEF_TTL, prefix="temp_") if TEMP_BRIEF_TTL else 0,
+        "failed_webhooks": webhooks.failed.expire(WEBHOOK_FAILED_TTL) if WEBHOOK_FAILED_TTL else 0
+    }
+    for name, queue in (("completed_briefs", completed_briefs), ("completed_content", completed_content)):
+        removed = queue.expire(RETENTION_MAX_AGE) if RETENTION_MAX_AGE else 0
+        if RETENTION_MAX_ENTRIES or RETENTION_MAX_BYTES:
+            removed += queue.evict(RETENTION_MAX_ENTRIES, RETENTION_MAX_BYTES, lru=RETENTION_POLICY == "lru")
+        swept[name] = removed
+    
+    with retention_lock:
+        for name, removed in swept.items():
+            retention_counters[name] += removed
+        retention_counters["sweeps"] += 1
+        retention_counters["last_sweep_at"] = time.time()
+    if any(swept.values()):
+        logger.info("Retention sweep removed %s", swept)
+    return swept
+
+def retention_loop():
+    while True:
+        time.sleep(RETENTION_SWEEP_INTERVAL)
+        try:
+            sweep_retention()
+        except Exception as e:
+            logger.exception("Retention sweep error: %s", e)
+
+def retention_stats():
+    with retention_lock:
+        return {
+            "policy": RETENTION_POLICY,
+            "max_age": RETENTION_MAX_AGE,
+            "max_entries": RETENTION_MAX_ENTRIES,
+            "max_bytes": RETENTION_MAX_BYTES,
+            "evicted": {name: retention_counters[name] for name in ("completed_briefs", "completed_content", "temp_briefs", "failed_webhooks")},
+            "sweeps": retention_counters["sweeps"],
+            "last_sweep_at": retention_counters["last_sweep_at"]
+        }
+
+# Nettoyage planifié dans chaque worker (les suppressions sont idempotentes entre workers)
+if RETENTION_SWEEP_INTERVAL > 0:
+    threading.Thread(target=retention_loop, name="retention", daemon=True).start()
 
 @app.route('/', methods=['GET'])
 def index():
@@ -35,6 +355,7 @@ def index():
             "/getSERPResults",
             "/getKeywordData",
             "/process",
+            "/processBatch",
             "/statut",
             "/envoyerBriefRedacteur",
             "/recupererContenu",
@@ -47,59 +368,174 @@ def index():
 def nouveau_brief():
     """
     Endpoint appelé par Make pour ajouter un nouveau mot-clé à traiter.
+    callback_url (optionnel) reçoit le brief terminé (événement brief.completed ou brief.failed).
     """
     data = request.json
     if not data or not data.get('keyword'):
         return jsonify({"error": "Keyword is required"}), 400
 
     keyword = data.get('keyword')
-    brief_id = f"brief_{int(time.time())}"
-    pending_briefs[brief_id] = {
+    callback_url = data.get('callback_url')
+    error = callback_url_error(callback_url) if callback_url else None
+    if error:
+        return jsonify({"error": error}), 400
+    
+    brief_entry = {
         "keyword": keyword,
         "status": "pending",
         "created_at": time.time()
     }
+    # Régénération forcée même si un brief récent existe pour ce mot-clé
+    if data.get('force'):
+        brief_entry["force"] = True
+    # Notification (POST JSON) à la fin du brief, au lieu d'interroger /recupererBrief
+    if callback_url:
+        brief_entry["callback_url"] = callback_url
+    brief_id = add_job(pending_briefs, "brief", brief_entry, taken=(completed_briefs,))
+    
+    # Préchargement optionnel des données SERP et Keyword Planner
+    if data.get('prefetch', PREFETCH_ON_INTAKE):
+        prefetch_executor.submit(prefetch_brief_data, brief_id, keyword)
+    
     return jsonify({
         "status": "Brief en cours de traitement",
         "brief_id": brief_id,
         "keyword": keyword
     }), 202
 
+# Lectures répétées de /recupererBrief et /recupererContenu (polling Make) : ETag calculé
+# à la fin du job, réponse 304 si If-None-Match correspond, corps compressé au-delà
+# de RESPONSE_COMPRESS_MIN_BYTES octets si le client l'accepte
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_COMPRESS_LEVEL = int(os.getenv("RESPONSE_COMPRESS_LEVEL", "6"))
+ETAG_FIELD = "_etag"  # stocké avec l'entrée (lisible sans le corps), jamais renvoyé aux clients
+
+def public_record(record):
+    """
+    Entrée telle que renvoyée aux clients et aux webhooks (sans l'ETag stocké).
+    """
+    return {key: value for key, value in record.items() if key != ETAG_FIELD}
+
+def content_hash(record):
+    """
+    Empreinte stable d'un brief ou contenu terminé (hors ETag stocké).
+    """
+    data = json.dumps(public_record(record), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+def with_etag(record):
+    record[ETAG_FIELD] = content_hash(record)
+    return record
+
+def compress_response(response):
+    """
+    Compresse le corps en br ou gzip selon Accept-Encoding.
+    """
+    data = response.get_data()
+    if len(data) < RESPONSE_COMPRESS_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(["br", "gzip"] if brotli else ["gzip"])
+    if encoding == "br":
+        data = brotli.compress(data, quality=RESPONSE_COMPRESS_LEVEL)
+    elif encoding == "gzip":
+        data = gzip.compress(data, compresslevel=RESPONSE_COMPRESS_LEVEL)
+    else:
+        return response
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def completed_metadata(queue, job_id):
+    """
+    Entrée terminée sans son corps (ni lecture ni décompression), ou None.
+    """
+    try:
+        return queue.metadata(job_id)
+    except KeyError:
+        return None
+
+def record_response(queue, job_id, metadata):
+    """
+    Réponse 200 d'un brief ou contenu terminé, ou 304 si le client a déjà cette
+    version (If-None-Match). metadata est l'entrée sans son corps : le corps n'est lu
+    et décompressé que pour une réponse 200. ETag faible : la représentation
+    compressée ou non a le même ETag.
+    """
+    if RETENTION_POLICY == "lru":
+        queue.touch(job_id)
+    etag = metadata.get(ETAG_FIELD)
+    record = None
+    if etag is None:
+        # Entrée antérieure aux ETags : hash calculé sur l'entrée complète
+        record = queue.get(job_id)
+        if record is None:
+            return jsonify({"error": "Not found"}), 404
+        etag = content_hash(record)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        record = record or queue.get(job_id)
+        if record is None:
+            # Supprimé entre-temps (rétention, /reset)
+            return jsonify({"error": "Not found"}), 404
+        response = compress_response(jsonify(public_record(record)))
+    response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    return response
+
 @app.route('/recupererBrief', methods=['GET'])
 def recuperer_brief():
     """
     Endpoint pour récupérer un brief.
+    Avec brief_id et wait=N, attend jusqu'à N secondes la fin du brief avant de répondre.
     """
     brief_id = request.args.get('brief_id')
     keyword = request.args.get('keyword')
+    try:
+        wait = long_poll_wait(request.args)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
 
     # Si l'appel spécifie un brief_id précis
     if brief_id:
-        if brief_id in completed_briefs:
-            return jsonify(completed_briefs[brief_id]), 200
-        elif brief_id in pending_briefs:
+        if wait:
+            wait_for_job(pending_briefs, completed_briefs, brief_id, wait)
+        brief_data = completed_metadata(completed_briefs, brief_id)
+        pending_data = pending_briefs.get(brief_id) if brief_data is None else None
+        if brief_data is not None:
+            return record_response(completed_briefs, brief_id, brief_data)
+        elif pending_data is not None:
+            status = pending_data.get("status", "pending")
+            if status == "failed":
+                return jsonify({
+                    "status": "failed",
+                    "brief_id": brief_id,
+                    "keyword": pending_data["keyword"],
+                    "error": pending_data.get("error")
+                }), 500
             return jsonify({
-                "status": "pending",
+                "status": status,
                 "brief_id": brief_id,
-                "keyword": pending_briefs[brief_id]["keyword"]
+                "keyword": pending_data["keyword"]
             }), 202
         else:
             return jsonify({"error": "Brief not found"}), 404
 
     # Si l'appel spécifie un keyword précis
     elif keyword:
-        matching = [b for b in completed_briefs.values() if b["keyword"] == keyword]
-        if matching:
-            return jsonify(matching[0]), 200
+        match = completed_briefs.find(keyword, body=False)
+        if match:
+            return record_response(completed_briefs, *match)
         else:
             return jsonify({"status": "No completed brief found for this keyword"}), 404
 
     # Sans paramètres, retourner le premier brief en attente
     else:
-        if pending_briefs:
-            brief_id = next(iter(pending_briefs))
+        first = next_pending_job(pending_briefs)
+        if first:
+            brief_id, brief_data = first
             return jsonify({
-                "keyword": pending_briefs[brief_id]["keyword"]
+                "keyword": brief_data["keyword"]
             }), 200
         else:
             return jsonify({"status": "No pending briefs"}), 204
@@ -117,22 +553,23 @@ def enregistrer_brief():
     brief_content = data.get('brief')
     
     # Chercher le brief_id correspondant au keyword dans les pending_briefs
-    matching_brief_ids = [bid for bid, bdata in pending_briefs.items() if bdata["keyword"] == keyword]
-    
-    if matching_brief_ids:
-        brief_id = matching_brief_ids[0]
-    else:
-        brief_id = f"brief_{int(time.time())}"
+    match = pending_briefs.find(keyword)
     
-    completed_briefs[brief_id] = {
+    completed_data = with_etag({
         "keyword": keyword,
         "brief": brief_content,
         "status": "completed",
         "completed_at": time.time()
-    }
+    })
     
-    if brief_id in pending_briefs:
-        del pending_briefs[brief_id]
+    if match:
+        brief_id = match[0]
+        with store.transaction():
+            completed_briefs[brief_id] = completed_data
+            job_callback("brief", brief_id, pending_briefs.pop(brief_id, None), completed_data)
+        notify_job_done()
+    else:
+        brief_id = add_job(completed_briefs, "brief", completed_data, taken=(pending_briefs,))
     
     return jsonify({
         "status": "Brief enregistré avec succès",
@@ -140,37 +577,70 @@ def enregistrer_brief():
         "brief": brief_content  # Retourner le brief pour assurer que le contenu est disponible
     }), 200
 
+# Cache disque des données Keyword Planner (partagé entre workers, conservé au redémarrage)
+KEYWORD_CACHE_TTL = int(os.getenv("KEYWORD_CACHE_TTL", str(7 * 24 * 3600)))
+KEYWORD_CACHE_ERROR_TTL = int(os.getenv("KEYWORD_CACHE_ERROR_TTL", "300"))  # entrées négatives
+keyword_cache = PersistentCache(os.getenv("KEYWORD_CACHE_PATH", "cache.db"), "keyword_data")
+
+# URLs des API Ngrok (à configurer dans les variables d'environnement)
+KEYWORD_API_URL = os.getenv("KEYWORD_API_URL", "https://keywordplanner.ngrok.app/semantique")
+SERP_API_URL = os.getenv("SERP_API_URL", "https://keywordplanner.ngrok.app/scrape")
+
+# Regroupement des appels concurrents identiques vers les services Ngrok
+keyword_flight = SingleFlight()
+serp_flight = SingleFlight()
+
 def get_keyword_data_from_api(mot_cle):
+    """
+    Fonction interne pour récupérer les données sémantiques d'un mot-clé.
+    Les réponses sont mises en cache KEYWORD_CACHE_TTL secondes,
+    les erreurs seulement KEYWORD_CACHE_ERROR_TTL secondes.
+    """
+    cache_key = normalize_keyword(mot_cle)
+    cached = keyword_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    return keyword_flight.do(cache_key, load_keyword_data, mot_cle, cache_key)
+
+def load_keyword_data(mot_cle, cache_key):
+    """
+    Interroge l'API Keyword Planner et enregistre la réponse dans le cache disque.
+    """
+    data = fetch_keyword_data(mot_cle)
+    ttl = KEYWORD_CACHE_ERROR_TTL if data.get("error") else KEYWORD_CACHE_TTL
+    keyword_cache.set(cache_key, data, ttl)
+    return data
+
+def fetch_keyword_data(mot_cle):
     """
     Fonction interne pour récupérer les données sémantiques du Google Keyword Planner via l'API Ngrok.
     """
     try:
-        # URL de votre API Ngrok (à configurer dans les variables d'environnement)
-        KEYWORD_API_URL = os.getenv("KEYWORD_API_URL", "https://keywordplanner.ngrok.app/semantique")
-        
         # Effectuer la requête POST avec le mot-clé
-        response = requests.post(
-            KEYWORD_API_URL,
-            json={"mot_cle": mot_cle},
-            timeout=60
-        )
+        response = post_json(KEYWORD_API_URL, {"mot_cle": mot_cle}, bucket="keyword")
         response.raise_for_status()
         
         # Récupérer les données JSON
         data = response.json()
-        print(f"Keyword data received from Ngrok for '{mot_cle}': {data}")
+        logger.debug("Keyword data received from Ngrok for '%s': %s", mot_cle, Payload(data))
         
         return data
     except Exception as e:
-        print(f"Error getting keyword data for '{mot_cle}': {str(e)}")
-        return {
-            "mot_cle_principal": mot_cle,
-            "volume_principal": None,
-            "concurrence": None,
-            "saisonnalite": {},
-            "suggestions": [],
-            "error": str(e)
-        }
+        logger.error("Error getting keyword data for '%s': %s", mot_cle, e)
+        return keyword_data_error(mot_cle, e)
+
+def keyword_data_error(mot_cle, error):
+    """
+    Réponse Keyword Planner vide renvoyée en cas d'erreur.
+    """
+    return {
+        "mot_cle_principal": mot_cle,
+        "volume_principal": None,
+        "concurrence": None,
+        "saisonnalite": {},
+        "suggestions": [],
+        "error": str(error)
+    }
 
 @app.route('/getKeywordData', methods=['GET'])
 def get_keyword_data():
@@ -184,96 +654,127 @@ def get_keyword_data():
     try:
         # Utiliser la fonction pour récupérer les données
         keyword_data = get_keyword_data_from_api(mot_cle)
-        print(f"Returning keyword data for '{mot_cle}' to Assistant GPT")
+        logger.info("Returning keyword data for '%s' to Assistant GPT", mot_cle)
         
         return jsonify(keyword_data), 200
     except Exception as e:
-        print(f"Unexpected error in getKeywordData: {str(e)}")
+        logger.exception("Unexpected error in getKeywordData: %s", e)
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
+# Cache des scrapes SERP (clé : mot-clé normalisé, valeur : données formatées)
+serp_cache = TTLCache(
+    ttl=int(os.getenv("SERP_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SERP_CACHE_MAX_ENTRIES", "500")),
+    max_bytes=int(os.getenv("SERP_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+)
+
 def get_serp_data_for_keyword(keyword):
+    """
+    Fonction interne pour récupérer les données SERP pour un mot-clé.
+    Les résultats sans erreur sont mis en cache (SERP_CACHE_TTL secondes).
+    """
+    cache_key = normalize_keyword(keyword)
+    formatted_data = serp_cache.get(cache_key)
+    if formatted_data is None:
+        formatted_data = serp_flight.do(cache_key, load_serp_data, keyword, cache_key)
+    formatted_data["query"] = keyword
+    return formatted_data
+
+def load_serp_data(keyword, cache_key):
+    """
+    Lance le scrape SERP et met en cache le résultat s'il ne contient pas d'erreur.
+    """
+    formatted_data = fetch_serp_data(keyword)
+    if "error" not in formatted_data:
+        serp_cache.set(cache_key, formatted_data)
+    return formatted_data
+
+def fetch_serp_data(keyword):
     """
     Fonction interne pour récupérer les données SERP pour un mot-clé,
     avec un formatage amélioré pour l'analyse concurrentielle.
     """
     try:
         # CHANGEMENT ICI : Utiliser Ngrok avec POST au lieu de Railway avec GET
-        SERP_API_URL = os.getenv("SERP_API_URL", "https://keywordplanner.ngrok.app/scrape")
-        response = requests.post(SERP_API_URL, json={"query": keyword}, timeout=60)
+        response = post_json(SERP_API_URL, {"query": keyword}, bucket="serp")
         response.raise_for_status()
         
-        serp_data = response.json()
-        
-        # Formater les données pour l'Assistant
-        formatted_data = {
-            "query": keyword,
-            "organic_results": [],
-            "related_searches": [],
-            "related_questions": []
-        }
+        return format_serp_data(keyword, response.json())
+    except Exception as e:
+        logger.error("Error getting SERP data for keyword '%s': %s", keyword, e)
+        return {"query": keyword, "error": str(e)}
+
+def format_serp_data(keyword, serp_data):
+    """
+    Formate la réponse brute du scraper pour l'Assistant.
+    """
+    # Formater les données pour l'Assistant
+    formatted_data = {
+        "query": keyword,
+        "organic_results": [],
+        "related_searches": [],
+        "related_questions": []
+    }
+    
+    # CHANGEMENT ICI : Le nouveau format utilise "top_10" au lieu de "results"
+    if "top_10" in serp_data and isinstance(serp_data["top_10"], list):
+        enhanced_results = []
         
-        # CHANGEMENT ICI : Le nouveau format utilise "top_10" au lieu de "results"
-        if "top_10" in serp_data and isinstance(serp_data["top_10"], list):
-            enhanced_results = []
+        for idx, result in enumerate(serp_data["top_10"]):  # Limiter aux 10 premiers
+            # Extraire le domaine si nécessaire
+            domain = result.get("domain", "")
+            if not domain and "url" in result:
+                try:
+                    parsed_url = urlparse(result["url"])
+                    domain = parsed_url.netloc
+                except:
+                    pass
             
-            for idx, result in enumerate(serp_data["top_10"]):  # Limiter aux 10 premiers
-                # Extraire le domaine si nécessaire
-                domain = result.get("domain", "")
-                if not domain and "url" in result:
-                    try:
-                        parsed_url = urlparse(result["url"])
-                        domain = parsed_url.netloc
-                    except:
-                        pass
-                
-                # S'assurer que word_count est bien présent
-                word_count = result.get("word_count", "N/A")
-                
-                # Améliorer les informations sur les médias
-                media_info = result.get("media", {})
-                images = media_info.get("images", 0)
-                videos = media_info.get("videos", 0)
-                
-                # Vérifier correctement les données structurées
-                structured_data = result.get("structured_data", [])
-                if structured_data and isinstance(structured_data, list) and len(structured_data) > 0:
-                    structured_data_info = ", ".join(structured_data)
-                    has_structured_data = True
-                else:
-                    structured_data_info = "Non disponible"
-                    has_structured_data = False
-                
-                # Créer un résultat amélioré
-                enhanced_result = dict(result)  # Copier toutes les données originales
-                
-                # Ajouter ou améliorer certains champs
-                enhanced_result["domain"] = domain or "N/A"
-                enhanced_result["word_count"] = word_count
-                enhanced_result["media_summary"] = {
-                    "images_count": images,
-                    "videos_count": videos,
-                    "has_media": (images > 0 or videos > 0)
-                }
-                enhanced_result["structured_data_info"] = structured_data_info
-                enhanced_result["has_structured_data"] = has_structured_data
-                enhanced_result["position"] = idx + 1
-                
-                enhanced_results.append(enhanced_result)
+            # S'assurer que word_count est bien présent
+            word_count = result.get("word_count", "N/A")
             
-            formatted_data["organic_results"] = enhanced_results
-        
-        # CHANGEMENT ICI : Le nouveau format utilise "associated_searches" directement
-        if "associated_searches" in serp_data and isinstance(serp_data["associated_searches"], list):
-            formatted_data["related_searches"] = serp_data["associated_searches"]
-        
-        # CHANGEMENT ICI : Le nouveau format utilise "paa" au lieu de "paa_questions"
-        if "paa" in serp_data and isinstance(serp_data["paa"], list):
-            formatted_data["related_questions"] = [{"question": q} for q in serp_data["paa"]]
+            # Améliorer les informations sur les médias
+            media_info = result.get("media", {})
+            images = media_info.get("images", 0)
+            videos = media_info.get("videos", 0)
+            
+            # Vérifier correctement les données structurées
+            structured_data = result.get("structured_data", [])
+            if structured_data and isinstance(structured_data, list) and len(structured_data) > 0:
+                structured_data_info = ", ".join(structured_data)
+                has_structured_data = True
+            else:
+                structured_data_info = "Non disponible"
+                has_structured_data = False
+            
+            # Créer un résultat amélioré
+            enhanced_result = dict(result)  # Copier toutes les données originales
+            
+            # Ajouter ou améliorer certains champs
+            enhanced_result["domain"] = domain or "N/A"
+            enhanced_result["word_count"] = word_count
+            enhanced_result["media_summary"] = {
+                "images_count": images,
+                "videos_count": videos,
+                "has_media": (images > 0 or videos > 0)
+            }
+            enhanced_result["structured_data_info"] = structured_data_info
+            enhanced_result["has_structured_data"] = has_structured_data
+            enhanced_result["position"] = idx + 1
+            
+            enhanced_results.append(enhanced_result)
         
-        return formatted_data
-    except Exception as e:
-        print(f"Error getting SERP data for keyword '{keyword}': {str(e)}")
-        return {"query": keyword, "error": str(e)}
+        formatted_data["organic_results"] = enhanced_results
+    
+    # CHANGEMENT ICI : Le nouveau format utilise "associated_searches" directement
+    if "associated_searches" in serp_data and isinstance(serp_data["associated_searches"], list):
+        formatted_data["related_searches"] = serp_data["associated_searches"]
+    
+    # CHANGEMENT ICI : Le nouveau format utilise "paa" au lieu de "paa_questions"
+    if "paa" in serp_data and isinstance(serp_data["paa"], list):
+        formatted_data["related_questions"] = [{"question": q} for q in serp_data["paa"]]
+    
+    return formatted_data
 
 @app.route('/getSERPResults', methods=['GET'])
 def get_serp_results():
@@ -287,38 +788,99 @@ def get_serp_results():
     try:
         # Utiliser la fonction améliorée
         formatted_data = get_serp_data_for_keyword(query)
-        print(f"SERP data for query '{query}': {formatted_data}")
+        logger.debug("SERP data for query '%s': %s", query, Payload(formatted_data))
         
         return jsonify(formatted_data), 200
     except Exception as e:
-        print(f"Unexpected error in getSERPResults: {str(e)}")
+        logger.exception("Unexpected error in getSERPResults: %s", e)
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
-def generate_brief_with_assistant(keyword, serp_data):
+def handle_brief_tool_call(keyword, function_name, function_args):
     """
-    Génère un brief SEO en utilisant l'assistant OpenAI existant.
-    Compatible avec openai v1.x et gère les états requires_action.
+    Traite un appel de fonction de l'Assistant GPT (brief) et retourne son résultat.
     """
-    try:
-        # Utiliser uniquement l'import moderne et supprimer l'import legacy
-        from openai import OpenAI
-        
-        # Créer le client sans proxy
-        client = OpenAI(api_key=API_KEY)
-        
-        # 1. Créer une conversation (thread)
-        thread = client.beta.threads.create()
-        thread_id = thread.id
-        
-        # 2. Préparer un message avec les instructions et les données SERP
-        message_content = f"""Génère un brief SEO pour le mot-clé '{keyword}' en suivant le canevas fourni. 
+    # Résultats réduits aux champs utiles (les endpoints HTTP renvoient les données complètes)
+    if function_name == "getSERPResults":
+        query = function_args.get("query", keyword)
+        return project_tool_output(function_name, get_serp_data_for_keyword(query))
+    elif function_name == "getKeywordData":
+        mot_cle = function_args.get("mot_cle", keyword)
+        return project_tool_output(function_name, get_keyword_data_from_api(mot_cle))
+    elif function_name == "recupererBrief":
+        return {"keyword": keyword}
+    elif function_name == "enregistrerBrief":
+        brief_data = function_args.get("brief", "")
+        if brief_data and "keyword" in function_args:
+            add_job(completed_briefs, "temp", {
+                "keyword": function_args["keyword"],
+                "brief": brief_data,
+                "status": "completed",
+                "completed_at": time.time(),
+                "is_temp": True
+            })
+        return {"status": "success"}
+    return {}
+
+def format_keyword_suggestion(suggestion):
+    """
+    Formate une suggestion du Keyword Planner sur une ligne.
+    """
+    if isinstance(suggestion, dict):
+        name = suggestion.get("mot_cle") or suggestion.get("keyword") or suggestion.get("texte")
+        if not name:
+            return json.dumps(suggestion, ensure_ascii=False)
+        volume = suggestion.get("volume", suggestion.get("volume_moyen"))
+        return f"{name} (volume: {volume})" if volume is not None else str(name)
+    return str(suggestion)
+
+# Budget de tokens du message de brief (0 = pas de limite) et longueur des descriptions
+BRIEF_PROMPT_TOKEN_BUDGET = int(os.getenv("BRIEF_PROMPT_TOKEN_BUDGET", "3000"))
+BRIEF_PROMPT_DESCRIPTION_CHARS = int(os.getenv("BRIEF_PROMPT_DESCRIPTION_CHARS", "200"))
+
+# Niveaux de compaction appliqués tant que le message dépasse le budget :
+# les champs les moins utiles au brief partent en premier (URL, suggestions, puis descriptions)
+BRIEF_PROMPT_LEVELS = [
+    {},
+    {"url": False, "suggestions": 10},
+    {"url": False, "suggestions": 5, "related": 8, "questions": 8, "description_chars": 100},
+    {"url": False, "suggestions": 5, "related": 5, "questions": 5, "description": False},
+    {"url": False, "suggestions": 0, "related": 3, "questions": 5, "description": False, "results": 5},
+]
+
+def build_brief_message(keyword, serp_data, keyword_data=None, budget=None):
+    """
+    Construit le message envoyé à l'Assistant GPT : instructions, données SERP
+    et, si disponibles, données Keyword Planner, dans la limite de budget tokens
+    (BRIEF_PROMPT_TOKEN_BUDGET par défaut).
+    Retourne (message, nombre de tokens estimé).
+    """
+    budget = BRIEF_PROMPT_TOKEN_BUDGET if budget is None else budget
+    
+    # Recherches associées et questions quasi identiques dédoublonnées
+    related_searches = dedupe_similar(serp_data.get("related_searches") or [])
+    related_questions = dedupe_similar([q.get("question", "") for q in serp_data.get("related_questions") or []])
+    
+    message_content, tokens, level = fit_to_budget(
+        lambda options: render_brief_message(keyword, serp_data, keyword_data, related_searches, related_questions, options),
+        BRIEF_PROMPT_LEVELS,
+        budget
+    )
+    if level:
+        logger.info("Brief prompt for '%s' compacted to level %s to fit %s tokens", keyword, level, budget)
+    return message_content, tokens
+
+def render_brief_message(keyword, serp_data, keyword_data, related_searches, related_questions, options):
+    """
+    Rédige le message de brief avec les options d'un niveau de compaction.
+    """
+    message_content = f"""Génère un brief SEO pour le mot-clé '{keyword}' en suivant le canevas fourni. 
 
 IMPORTANT: TOUJOURS retourner le BRIEF COMPLET et NE JAMAIS retourner uniquement un message de confirmation. Le brief généré doit être le contenu principal de ta réponse.
 
 Voici les données SERP:"""
-        
-        # Ajouter des instructions pour l'analyse concurrentielle
-        message_content += """
+    
+    # Ajouter des instructions pour l'analyse concurrentielle
+    message_content += """
 
 IMPORTANT: Pour l'analyse concurrentielle (section II.1), assure-toi d'inclure les informations suivantes pour chaque résultat:
 - Domaine: disponible dans le champ "domain"
@@ -329,40 +891,86 @@ IMPORTANT: Pour l'analyse concurrentielle (section II.1), assure-toi d'inclure l
 
 Pour chaque résultat, identifie également au moins une force et une faiblesse.
 """
-        
-        # Ajouter les résultats organiques
-        if "organic_results" in serp_data and serp_data["organic_results"]:
-            message_content += "\n\n## Top résultats Google:"
-            for result in serp_data["organic_results"][:10]:
-                position = result.get("position", "N/A")
-                title = result.get("page_title", "")
-                url = result.get("url", "")
-                description = result.get("meta_description", "")
-                domain = result.get("domain", "")
-                word_count = result.get("word_count", "N/A")
-                media_info = result.get("media_summary", {})
-                structured_data = result.get("structured_data_info", "Non disponible")
-                
-                message_content += f"\n{position}. {title}"
+    
+    # Ajouter les résultats organiques
+    organic_results = serp_data.get("organic_results") or []
+    if organic_results:
+        message_content += "\n\n## Top résultats Google:"
+        for result in organic_results[:options.get("results", 10)]:
+            position = result.get("position", "N/A")
+            title = result.get("page_title", "")
+            url = result.get("url", "")
+            description = truncate_text(
+                result.get("meta_description", ""),
+                options.get("description_chars", BRIEF_PROMPT_DESCRIPTION_CHARS)
+            )
+            domain = result.get("domain", "")
+            word_count = result.get("word_count", "N/A")
+            media_info = result.get("media_summary", {})
+            structured_data = result.get("structured_data_info", "Non disponible")
+            
+            message_content += f"\n{position}. {title}"
+            if options.get("url", True):
                 message_content += f"\n   URL: {url}"
+            if options.get("description", True) and description:
                 message_content += f"\n   Description: {description}"
-                message_content += f"\n   Domaine: {domain}"
-                message_content += f"\n   Volumétrie: {word_count} mots"
-                message_content += f"\n   Médias: Images: {media_info.get('images_count', 0)}, Vidéos: {media_info.get('videos_count', 0)}"
-                message_content += f"\n   Données structurées: {structured_data}"
-                message_content += "\n"
-        
-        # Ajouter les recherches associées
-        if "related_searches" in serp_data and serp_data["related_searches"]:
-            message_content += "\n\n## Recherches associées:"
-            for search in serp_data["related_searches"]:
-                message_content += f"\n- {search}"
-        
-        # Ajouter les questions fréquentes
-        if "related_questions" in serp_data and serp_data["related_questions"]:
-            message_content += "\n\n## Questions fréquentes:"
-            for question in serp_data["related_questions"]:
-                message_content += f"\n- {question.get('question', '')}"
+            message_content += f"\n   Domaine: {domain}"
+            message_content += f"\n   Volumétrie: {word_count} mots"
+            message_content += f"\n   Médias: Images: {media_info.get('images_count', 0)}, Vidéos: {media_info.get('videos_count', 0)}"
+            message_content += f"\n   Données structurées: {structured_data}"
+            message_content += "\n"
+    
+    # Ajouter les recherches associées
+    related_searches = related_searches[:options.get("related")]
+    if related_searches:
+        message_content += "\n\n## Recherches associées:"
+        for search in related_searches:
+            message_content += f"\n- {search}"
+    
+    # Ajouter les questions fréquentes
+    related_questions = related_questions[:options.get("questions")]
+    if related_questions:
+        message_content += "\n\n## Questions fréquentes:"
+        for question in related_questions:
+            message_content += f"\n- {question}"
+    
+    # Ajouter les données Keyword Planner (volume, concurrence, saisonnalité)
+    if keyword_data and not keyword_data.get("error"):
+        message_content += "\n\n## Données Keyword Planner (inutile d'appeler getKeywordData pour ce mot-clé):"
+        message_content += f"\n- Mot-clé principal: {keyword_data.get('mot_cle_principal', keyword)}"
+        message_content += f"\n- Volume de recherche: {keyword_data.get('volume_principal', 'N/A')}"
+        message_content += f"\n- Concurrence: {keyword_data.get('concurrence', 'N/A')}"
+        saisonnalite = keyword_data.get("saisonnalite") or {}
+        if saisonnalite:
+            if isinstance(saisonnalite, dict):
+                saisonnalite = ", ".join(f"{mois}: {volume}" for mois, volume in saisonnalite.items())
+            message_content += f"\n- Saisonnalité: {saisonnalite}"
+        suggestions = (keyword_data.get("suggestions") or [])[:options.get("suggestions")]
+        if suggestions:
+            message_content += "\n- Suggestions:"
+            for suggestion in suggestions:
+                message_content += f"\n  - {format_keyword_suggestion(suggestion)}"
+    
+    return message_content
+
+def generate_brief_with_assistant(keyword, serp_data, keyword_data=None):
+    """
+    Génère un brief SEO en utilisant l'assistant OpenAI existant.
+    Compatible avec openai v1.x et gère les états requires_action.
+    Si keyword_data est fourni, les données Keyword Planner sont incluses
+    dans le message, ce qui évite un appel getKeywordData.
+    """
+    try:
+        # Client partagé (pool de connexions réutilisé entre les appels)
+        client = get_openai_client()
+        
+        # 1. Créer une conversation (thread)
+        thread = client.beta.threads.create()
+        thread_id = thread.id
+        
+        # 2. Préparer un message avec les instructions et les données SERP (dans le budget de tokens)
+        message_content, prompt_tokens = build_brief_message(keyword, serp_data, keyword_data)
+        logger.info("Brief prompt for '%s': ~%s tokens", keyword, prompt_tokens)
         
         # 3. Ajouter le message au thread
         client.beta.threads.messages.create(
@@ -371,192 +979,601 @@ Pour chaque résultat, identifie également au moins une force et une faiblesse.
             content=message_content
         )
         
-        # 4. Exécuter l'assistant sur le thread
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=ASSISTANT_ID
+        # 4. Exécuter l'assistant sur le thread jusqu'à la fin du run
+        execute_run(
+            client,
+            thread_id,
+            ASSISTANT_ID,
+            lambda name, args: handle_brief_tool_call(keyword, name, args),
+            poll_interval=3,
+            label="Run"
         )
         
-        # 5. Attendre que l'assistant termine son travail (boucle sans limite)
-        run_id = run.id
-        while True:
-            time.sleep(3)  # éviter trop de requêtes
-            run = client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run_id
-            )
-            run_status = run.status
-            print(f"Run status: {run_status}")
-            
-            if run_status == "completed":
-                break
-            elif run_status == "requires_action":
-                # Gérer l'action requise - approuver automatiquement les fonctions
-                required_actions = run.required_action
-                if required_actions and required_actions.type == "submit_tool_outputs":
-                    tool_calls = required_actions.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-                    
-                    print(f"Assistant requires action with {len(tool_calls)} tool calls")
-                    
-                    for tool_call in tool_calls:
-                        tool_call_id = tool_call.id
-                        function_name = tool_call.function.name
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        print(f"Tool call: {function_name} with args: {function_args}")
-                        
-                        # Traiter l'appel de fonction et obtenir un résultat
-                        result = {}
-                        
-                        if function_name == "getSERPResults":
-                            query = function_args.get("query", keyword)
-                            serp_result = get_serp_data_for_keyword(query)
-                            result = serp_result
-                        elif function_name == "getKeywordData":
-                            mot_cle = function_args.get("mot_cle", keyword)
-                            keyword_result = get_keyword_data_from_api(mot_cle)
-                            result = keyword_result
-                        elif function_name == "recupererBrief":
-                            result = {"keyword": keyword}
-                        elif function_name == "enregistrerBrief":
-                            brief_data = function_args.get("brief", "")
-                            if brief_data and "keyword" in function_args:
-                                temp_brief_id = f"temp_{int(time.time())}"
-                                completed_briefs[temp_brief_id] = {
-                                    "keyword": function_args["keyword"],
-                                    "brief": brief_data,
-                                    "status": "completed",
-                                    "completed_at": time.time(),
-                                    "is_temp": True
-                                }
-                            result = {"status": "success"}
-                        
-                        output = json.dumps(result)
-                        tool_outputs.append({
-                            "tool_call_id": tool_call_id,
-                            "output": output
-                        })
-                    
-                    client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread_id,
-                        run_id=run_id,
-                        tool_outputs=tool_outputs
-                    )
-                    print(f"Submitted {len(tool_outputs)} tool outputs")
-                else:
-                    raise Exception(f"Unknown required action type: {required_actions.type if required_actions else 'None'}")
-            elif run_status in ["failed", "cancelled", "expired"]:
-                raise Exception(f"Assistant run failed with status: {run_status}")
-            
-            if run_status not in ["completed", "requires_action", "in_progress", "queued"]:
-                raise Exception(f"Unexpected status: {run_status}")
-        
-        # 6. Récupérer la réponse de l'assistant
-        messages = client.beta.threads.messages.list(
-            thread_id=thread_id
-        )
+        # 5. Récupérer la dernière réponse de l'assistant
+        return resolve_brief_reply(keyword, get_assistant_reply(client, thread_id))
         
-        # Récupérer la dernière réponse de l'assistant
-        brief_content = None
+    except Exception as e:
+        logger.error("Error generating brief with assistant: %s", e)
+        raise e
+
+def resolve_brief_reply(keyword, brief_content):
+    """
+    Valide la réponse de l'assistant et retourne le brief. Si l'assistant n'a écrit
+    qu'une confirmation, reprend le brief temporaire enregistré par enregistrerBrief.
+    """
+    if not brief_content:
+        raise Exception("No assistant response found")
         
-        for message in messages.data:
-            if message.role == "assistant":
-                message_parts = []
-                for content_part in message.content:
-                    if content_part.type == "text":
-                        message_parts.append(content_part.text.value)
-                if message_parts:
-                    brief_content = "\n".join(message_parts)
-                    break
+    # Si l'assistant a écrit seulement une confirmation, récupérer le temp si dispo
+    if "a été généré et enregistré avec succès" in brief_content and len(brief_content.strip().split("\n")) < 5:
+        for brief_id, brief_data in completed_briefs.find_all(keyword, body=False):
+            if not brief_data.get("is_temp"):
+                continue
+            brief_data = completed_briefs.get(brief_id)
+            if brief_data and len(brief_data.get("brief", "")) > 100:
+                brief_content = brief_data["brief"]
+                del completed_briefs[brief_id]
+                break
         
-        if not brief_content:
-            raise Exception("No assistant response found")
-            
-        # Si l'assistant a écrit seulement une confirmation, récupérer le temp si dispo
         if "a été généré et enregistré avec succès" in brief_content and len(brief_content.strip().split("\n")) < 5:
-            for brief_id, brief_data in list(completed_briefs.items()):
-                if brief_data.get("keyword") == keyword and brief_data.get("is_temp") and len(brief_data.get("brief", "")) > 100:
-                    brief_content = brief_data["brief"]
-                    del completed_briefs[brief_id]
-                    break
-            
-            if "a été généré et enregistré avec succès" in brief_content and len(brief_content.strip().split("\n")) < 5:
-                raise Exception("Assistant returned only a confirmation message without full brief content")
-        
-        return brief_content
+            raise Exception("Assistant returned only a confirmation message without full brief content")
+    
+    return brief_content
+
+# Récupération en parallèle des données SERP et Keyword Planner d'un brief
+fetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FETCH_WORKERS", "8")), thread_name_prefix="fetch")
+
+def fetch_brief_inputs(keyword):
+    """
+    Récupère simultanément les données SERP et Keyword Planner d'un mot-clé.
+    Retourne (serp_data, keyword_data).
+    """
+    keyword_future = fetch_executor.submit(get_keyword_data_from_api, keyword)
+    serp_data = get_serp_data_for_keyword(keyword)
+    return serp_data, keyword_future.result()
+
+# Préchargement à l'intake (/nouveauBrief) des données SERP et Keyword Planner
+PREFETCH_ON_INTAKE = os.getenv("PREFETCH_ON_INTAKE", "false").lower() in ("1", "true", "yes")
+PREFETCH_MAX_AGE = int(os.getenv("PREFETCH_MAX_AGE", "3600"))  # secondes avant de refaire un fetch
+prefetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PREFETCH_WORKERS", "2")), thread_name_prefix="prefetch")
+
+def prefetch_brief_data(brief_id, keyword):
+    """
+    Récupère en tâche de fond les données SERP et Keyword Planner d'un brief en attente
+    et les attache à son entrée, pour que /process démarre le run sans attendre le scrape.
+    """
+    try:
+        serp_data, keyword_data = fetch_brief_inputs(keyword)
         
+        with store.transaction():
+            brief_data = pending_briefs.get(brief_id)
+            # Inutile si le brief a déjà été pris en charge entre-temps
+            if brief_data is None or brief_data.get("status", "pending") != "pending":
+                return
+            brief_data["prefetch"] = {
+                "serp_data": serp_data,
+                "keyword_data": keyword_data,
+                "fetched_at": time.time()
+            }
+            pending_briefs[brief_id] = brief_data
+        logger.info("Prefetched SERP and keyword data for brief %s", brief_id)
     except Exception as e:
-        print(f"Error generating brief with assistant: {str(e)}")
-        raise e
+        logger.warning("Error prefetching data for brief %s: %s", brief_id, e)
 
-@app.route('/process', methods=['GET'])
-def process_queue():
+def fresh_prefetch(prefetched):
     """
-    Traite la file d'attente des briefs en appelant l'Assistant GPT.
+    Retourne les données préchargées si elles sont encore exploitables, sinon None.
+    """
+    if not prefetched or time.time() - prefetched.get("fetched_at", 0) > PREFETCH_MAX_AGE:
+        return None
+    if "error" in prefetched.get("serp_data", {"error": "missing"}):
+        return None
+    return prefetched
+
+def run_brief_job(brief_id, keyword, prefetched=None):
+    """
+    Récupère les données SERP, génère le brief et l'enregistre.
+    Exécuté dans le pool de threads (ou directement en mode synchrone).
     """
-    brief_id = request.args.get('brief_id')
-    
-    # Si un brief_id spécifique est fourni, traiter ce brief
-    if brief_id and brief_id in pending_briefs:
-        keyword = pending_briefs[brief_id]["keyword"]
-    # Sinon, prendre le premier brief en attente
-    elif pending_briefs:
-        brief_id = next(iter(pending_briefs))
-        keyword = pending_briefs[brief_id]["keyword"]
-    else:
-        return jsonify({"status": "No pending briefs to process"}), 200
-    
     try:
-        # 1. Obtenir les données SERP
-        print(f"Getting SERP data for keyword: {keyword}")
-        serp_data = get_serp_data_for_keyword(keyword)
+        # 1. Obtenir les données SERP et Keyword Planner (préchargées à l'intake si encore fraîches)
+        prefetched = fresh_prefetch(prefetched)
+        if prefetched:
+            logger.info("Using prefetched SERP data for keyword: %s", keyword)
+            serp_data = prefetched["serp_data"]
+            keyword_data = prefetched.get("keyword_data") or {"error": "missing"}
+            if keyword_data.get("error"):
+                keyword_data = get_keyword_data_from_api(keyword)
+        else:
+            logger.info("Getting SERP and keyword data for keyword: %s", keyword)
+            serp_data, keyword_data = fetch_brief_inputs(keyword)
         
         # 2. Appeler l'Assistant GPT avec ces données
-        print(f"Generating brief with Assistant for keyword: {keyword}")
-        brief_content = generate_brief_with_assistant(keyword, serp_data)
+        logger.info("Generating brief with Assistant for keyword: %s", keyword)
+        brief_content = generate_brief_with_assistant(keyword, serp_data, keyword_data)
         
         # 3. Enregistrer le brief généré
-        print(f"Saving brief for keyword: {keyword}")
-        completed_briefs[brief_id] = {
+        save_brief(brief_id, keyword, brief_content)
+        
+        return brief_content
+    except Exception as e:
+        logger.exception("Error processing brief: %s", e)
+        mark_job_failed(pending_briefs, brief_id, f"Failed to process brief: {str(e)}")
+        raise
+
+def save_brief(brief_id, keyword, brief_content):
+    """
+    Enregistre le brief généré et le retire de la file d'attente.
+    """
+    logger.info("Saving brief for keyword: %s", keyword)
+    with store.transaction():
+        completed_data = completed_briefs[brief_id] = with_etag({
             "keyword": keyword,
             "brief": brief_content,
             "status": "completed",
             "completed_at": time.time()
-        }
-        
-        # Supprimer de la file d'attente
-        if brief_id in pending_briefs:
-            del pending_briefs[brief_id]
+        })
         
+        # Supprimer de la file d'attente (et notifier la callback_url du job)
+        job_callback("brief", brief_id, pending_briefs.pop(brief_id, None), completed_data)
+    notify_job_done()
+
+# Réutilisation des briefs récents : un mot-clé déjà traité depuis moins de
+# BRIEF_REUSE_WINDOW secondes reprend le brief existant (0 = toujours régénérer)
+BRIEF_REUSE_WINDOW = int(os.getenv("BRIEF_REUSE_WINDOW", "0"))
+brief_reuse_lock = threading.Lock()
+brief_reuse_counters = {"hits": 0, "misses": 0, "forced": 0}
+
+def count_brief_reuse(outcome):
+    with brief_reuse_lock:
+        brief_reuse_counters[outcome] += 1
+
+def brief_reuse_stats():
+    with brief_reuse_lock:
+        lookups = brief_reuse_counters["hits"] + brief_reuse_counters["misses"]
+        return {
+            "window": BRIEF_REUSE_WINDOW,
+            **brief_reuse_counters,
+            "hit_rate": round(brief_reuse_counters["hits"] / lookups, 3) if lookups else None
+        }
+
+def find_reusable_brief(keyword):
+    """
+    Retourne le brief complété (hors temp) le plus récent pour ce mot-clé normalisé
+    s'il a été généré dans la fenêtre BRIEF_REUSE_WINDOW, sinon None.
+    """
+    for brief_id, brief_data in completed_briefs.find_all(keyword, newest=True, body=False):
+        if brief_data.get("is_temp"):
+            continue
+        generated_at = brief_data.get("generated_at", brief_data.get("completed_at", 0))
+        if time.time() - generated_at <= BRIEF_REUSE_WINDOW:
+            # Seul le brief retenu est lu en entier
+            brief_data = completed_briefs.get(brief_id)
+            return (brief_id, brief_data) if brief_data else None
+        return None
+    return None
+
+def reuse_recent_brief(brief_id, keyword, force=False):
+    """
+    Si la réutilisation est active et qu'un brief récent existe pour le mot-clé,
+    l'enregistre comme résultat de brief_id sans appeler l'assistant.
+    Retourne (brief, brief_id source) ou None s'il faut générer le brief.
+    """
+    if BRIEF_REUSE_WINDOW <= 0:
+        return None
+    if force:
+        count_brief_reuse("forced")
+        return None
+    match = find_reusable_brief(keyword)
+    if match is None:
+        count_brief_reuse("misses")
+        return None
+    source_id, source = match
+    # Un brief déjà réutilisé pointe vers le brief réellement généré
+    source_id = source.get("reused_from", source_id)
+    logger.info("Reusing brief %s for keyword: %s", source_id, keyword)
+    with store.transaction():
+        completed_data = completed_briefs[brief_id] = with_etag({
+            "keyword": keyword,
+            "brief": source["brief"],
+            "status": "completed",
+            "completed_at": time.time(),
+            "generated_at": source.get("generated_at", source.get("completed_at")),
+            "reused_from": source_id
+        })
+        job_callback("brief", brief_id, pending_briefs.pop(brief_id, None), completed_data)
+    notify_job_done()
+    count_brief_reuse("hits")
+    return source["brief"], source_id
+
+def brief_reused(brief_id, reused):
+    """
+    Réponse de /process quand un brief récent a été repris.
+    """
+    return {
+        "status": "Brief processed successfully",
+        "brief_id": brief_id,
+        "brief": reused[0],
+        "reused_from": reused[1]
+    }
+
+def claim_brief_for_processing(brief_id=None):
+    """
+    Choisit le brief à traiter (brief_id donné ou premier en attente) et le réclame.
+    Retourne (brief_id, brief_data, None), ou (brief_id, None, (payload, status))
+    si aucune génération n'est à lancer.
+    """
+    # Si un brief_id spécifique est fourni, traiter ce brief
+    if brief_id:
+        if brief_id not in pending_briefs:
+            if brief_id in completed_briefs:
+                return brief_id, None, ({"status": "Brief already completed", "brief_id": brief_id}, 200)
+            brief_id = None
+    # Sinon, prendre le premier brief en attente
+    if not brief_id:
+        first = next_pending_job(pending_briefs, retry_failed=True)
+        if not first:
+            return None, None, ({"status": "No pending briefs to process"}, 200)
+        brief_id = first[0]
+    
+    brief_data = claim_job(pending_briefs, brief_id, allow_retry=True)
+    if brief_data is None:
+        return brief_id, None, ({
+            "status": "processing",
+            "brief_id": brief_id,
+            "status_url": f"/recupererBrief?brief_id={brief_id}"
+        }, 202)
+    return brief_id, brief_data, None
+
+@app.route('/process', methods=['GET'])
+def process_queue():
+    """
+    Traite la file d'attente des briefs en appelant l'Assistant GPT.
+    Par défaut, la génération part en tâche de fond et l'endpoint répond 202 ;
+    le résultat se récupère via /recupererBrief?brief_id=...
+    Avec sync=true, l'endpoint attend la fin de la génération (ancien comportement).
+    Si un brief récent existe pour le mot-clé (BRIEF_REUSE_WINDOW), il est repris
+    immédiatement, sauf avec force=true.
+    Sans brief_id, traite le premier brief en attente ou, s'il n'y en a plus,
+    relance le plus ancien brief en échec.
+    """
+    sync = request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+    
+    brief_id, brief_data, early = claim_brief_for_processing(request.args.get('brief_id'))
+    if early:
+        return jsonify(early[0]), early[1]
+    keyword = brief_data["keyword"]
+    
+    reused = reuse_recent_brief(brief_id, keyword, force or brief_data.get("force", False))
+    if reused:
+        return jsonify(brief_reused(brief_id, reused)), 200
+    
+    if sync:
+        try:
+            brief_content = run_brief_job(brief_id, keyword, brief_data.get("prefetch"))
+        except Exception as e:
+            return jsonify({
+                "error": f"Failed to process brief: {str(e)}",
+                "brief_id": brief_id
+            }), 500
         return jsonify({
             "status": "Brief processed successfully",
             "brief_id": brief_id,
             "brief": brief_content
         }), 200
-    except Exception as e:
-        print(f"Error processing brief: {str(e)}")
+    
+    if not submit_background(run_brief_job, brief_id, keyword, brief_data.get("prefetch")):
+        release_job(pending_briefs, brief_id)
         return jsonify({
-            "error": f"Failed to process brief: {str(e)}",
+            "error": "Too many jobs in progress, retry later",
             "brief_id": brief_id
-        }), 500
+        }), 503
+    
+    return jsonify({
+        "status": "processing",
+        "brief_id": brief_id,
+        "keyword": keyword,
+        "status_url": f"/recupererBrief?brief_id={brief_id}"
+    }), 202
+
+# Limites des traitements par lot
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "200"))
+
+def update_batch(batch_id, **fields):
+    """
+    Met à jour l'entrée d'un batch (les résultats par brief sont fusionnés).
+    """
+    with store.transaction():
+        batch = batches.get(batch_id)
+        if batch is None:
+            return None
+        results = fields.pop("results", None)
+        if results:
+            batch["results"].update(results)
+        batch.update(fields)
+        batches[batch_id] = batch
+        return batch
+
+def submit_batch(batch_id, jobs, concurrency, force=False):
+    """
+    Confie les briefs réclamés d'un batch au pool des tâches de fond, au plus `concurrency`
+    à la fois : chaque brief en cours occupe une place du pool (background_slots) comme
+    un job de /process, et enregistre son résultat au fil de l'eau.
+    Retourne un Future résolu avec le batch terminé, ou None si le pool est saturé.
+    Avec moins de places libres que `concurrency`, le batch avance avec celles obtenues.
+    """
+    slots = 0
+    while slots < min(concurrency, len(jobs)) and background_slots.acquire(blocking=False):
+        slots += 1
+    if not slots:
+        return None
+    
+    started_at = time.time()
+    remaining = iter(jobs)
+    outcomes = {}
+    lock = threading.Lock()
+    done = Future()
+    
+    def submit_next():
+        # Brief suivant sur la place libérée, ou restitution de la place au pool
+        with lock:
+            job = next(remaining, None)
+        if job is None:
+            background_slots.release()
+        else:
+            executor.submit(process_one, job)
+    
+    def process_one(job):
+        brief_id, brief_data = job
+        brief_started_at = time.time()
+        try:
+            if restamp_job(pending_briefs, brief_id, brief_data["started_at"]) is None:
+                outcome = record_batch_outcome(batch_id, brief_id, brief_data, brief_started_at, skipped=True)
+            else:
+                reused = reuse_recent_brief(brief_id, brief_data["keyword"], force or brief_data.get("force", False))
+                error = None
+                if not reused:
+                    try:
+                        run_brief_job(brief_id, brief_data["keyword"], brief_data.get("prefetch"))
+                    except Exception as e:
+                        error = e
+                outcome = record_batch_outcome(batch_id, brief_id, brief_data, brief_started_at, error, reused)
+        except Exception as e:
+            logger.exception("Batch %s: error on brief %s: %s", batch_id, brief_id, e)
+            outcome = {"keyword": brief_data["keyword"], "status": "failed", "error": str(e)}
+        with lock:
+            outcomes[brief_id] = outcome
+            last = len(outcomes) == len(jobs)
+        if last:
+            try:
+                done.set_result(finish_batch(batch_id, [outcomes[bid] for bid, _ in jobs], started_at))
+            except Exception as e:
+                done.set_exception(e)
+        submit_next()
+    
+    for _ in range(slots):
+        submit_next()
+    return done
+
+def record_batch_outcome(batch_id, brief_id, brief_data, brief_started_at, error=None, reused=None, skipped=False):
+    """
+    Enregistre dans le batch le résultat d'un brief et le retourne.
+    skipped : brief repris par un autre worker pendant son attente, non traité par ce batch.
+    """
+    outcome = {"keyword": brief_data["keyword"]}
+    if skipped:
+        outcome["status"] = "skipped"
+    elif reused:
+        outcome["status"] = "completed"
+        outcome["reused_from"] = reused[1]
+    elif error is None:
+        outcome["status"] = "completed"
+    else:
+        outcome["status"] = "failed"
+        outcome["error"] = str(error)
+    outcome["duration"] = round(time.time() - brief_started_at, 2)
+    update_batch(batch_id, results={brief_id: outcome})
+    return outcome
+
+def finish_batch(batch_id, outcomes, started_at):
+    """
+    Marque le batch comme terminé avec son résumé.
+    """
+    completed = len([o for o in outcomes if o["status"] == "completed"])
+    skipped = len([o for o in outcomes if o["status"] == "skipped"])
+    logger.info("Batch %s done: %s/%s briefs in %.2fs", batch_id, completed, len(outcomes), time.time() - started_at)
+    return update_batch(
+        batch_id,
+        status="completed",
+        completed_at=time.time(),
+        duration=round(time.time() - started_at, 2),
+        summary={"completed": completed, "failed": len(outcomes) - completed - skipped, "skipped": skipped}
+    )
+
+def start_batch(data, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """
+    Valide une demande de batch, réclame les briefs et crée l'entrée du batch.
+    La concurrence demandée est plafonnée à max_concurrency : la valeur effective
+    est celle enregistrée et renvoyée.
+    Retourne (batch_id, jobs, concurrency, None), ou (None, None, None, (payload, status)).
+    """
+    try:
+        limit = max(1, min(int(data.get('limit', BATCH_MAX_SIZE)), BATCH_MAX_SIZE))
+        concurrency = max(1, min(int(data.get('concurrency', BATCH_CONCURRENCY)), max_concurrency))
+    except (TypeError, ValueError):
+        return None, None, None, ({"error": "limit and concurrency must be integers"}, 400)
+    
+    brief_ids = data.get('brief_ids')
+    if not brief_ids:
+        brief_ids = [bid for bid, bdata in pending_briefs.items() if job_claimable(bdata)]
+    
+    # Réclamer les briefs (ceux déjà pris par un autre worker sont ignorés)
+    jobs = []
+    for brief_id in brief_ids:
+        if len(jobs) >= limit:
+            break
+        brief_data = claim_job(pending_briefs, brief_id)
+        if brief_data is not None:
+            # Copie : started_at doit rester celui de la réclamation (voir restamp_job),
+            # or le backend mémoire partage l'objet stocké
+            jobs.append((brief_id, dict(brief_data)))
+    
+    if not jobs:
+        return None, None, None, ({"status": "No pending briefs to process"}, 200)
+    
+    batch_id = add_job(batches, "batch", {
+        "status": "processing",
+        "brief_ids": [brief_id for brief_id, _ in jobs],
+        "concurrency": concurrency,
+        "results": {},
+        "started_at": time.time()
+    })
+    return batch_id, jobs, concurrency, None
+
+def cancel_batch(batch_id, jobs):
+    """
+    Annule un batch qui n'a pas pu démarrer (briefs remis en attente).
+    """
+    for brief_id, _ in jobs:
+        release_job(pending_briefs, brief_id)
+    batches.pop(batch_id, None)
+
+def batch_started(batch_id, jobs, concurrency):
+    """
+    Réponse 202 d'un batch lancé en tâche de fond.
+    """
+    return {
+        "status": "processing",
+        "batch_id": batch_id,
+        "brief_ids": [brief_id for brief_id, _ in jobs],
+        "concurrency": concurrency,
+        "status_url": f"/processBatch?batch_id={batch_id}"
+    }
+
+@app.route('/processBatch', methods=['GET', 'POST'])
+def process_batch():
+    """
+    Traite plusieurs briefs en attente en parallèle (concurrence bornée).
+    POST : {"limit": N, "concurrency": C, "brief_ids": [...] (optionnel), "wait": false, "force": false}
+    Sans wait, répond 202 et l'avancement se lit via GET /processBatch?batch_id=...
+    Les briefs passent par le pool des tâches de fond : BACKGROUND_WORKERS borne
+    les générations simultanées, batchs compris, et plafonne concurrency (valeur effective
+    renvoyée). Un brief repris par un autre worker avant son tour est marqué "skipped".
+    """
+    if request.method == 'GET':
+        batch_id = request.args.get('batch_id')
+        if not batch_id:
+            return jsonify({"error": "Parameter 'batch_id' is required"}), 400
+        batch = batches.get(batch_id)
+        if batch is None:
+            return jsonify({"error": "Batch not found"}), 404
+        return jsonify({"batch_id": batch_id, **batch}), 200 if batch["status"] == "completed" else 202
+    
+    data = request.get_json(silent=True) or {}
+    # Au-delà de BACKGROUND_WORKERS, les briefs attendraient de toute façon une place du pool
+    batch_id, jobs, concurrency, early = start_batch(data, min(BATCH_MAX_CONCURRENCY, BACKGROUND_WORKERS))
+    if early:
+        return jsonify(early[0]), early[1]
+    
+    force = bool(data.get('force'))
+    done = submit_batch(batch_id, jobs, concurrency, force)
+    if done is None:
+        cancel_batch(batch_id, jobs)
+        return jsonify({"error": "Too many jobs in progress, retry later"}), 503
+    
+    if data.get('wait'):
+        batch = done.result()
+        return jsonify({"batch_id": batch_id, **batch}), 200
+    
+    return jsonify(batch_started(batch_id, jobs, concurrency)), 202
+
+# Listes consultables via /statut?list=... : file -> (clé d'identifiant, champs listés, champ de date pour since)
+STATUT_LISTS = {
+    "pending_briefs": (pending_briefs, "brief_id", ("keyword", "status"), "created_at"),
+    "completed_briefs": (completed_briefs, "brief_id", ("keyword", "is_temp"), "completed_at"),
+    "pending_content": (pending_content, "content_id", ("brief_id", "status"), "created_at"),
+    "completed_content": (completed_content, "content_id", ("brief_id", "keyword"), "completed_at"),
+}
+STATUT_LIST_LIMIT = int(os.getenv("STATUT_LIST_LIMIT", "50"))
+STATUT_LIST_MAX_LIMIT = int(os.getenv("STATUT_LIST_MAX_LIMIT", "500"))
+
+def statut_page(name, cursor=None, limit=STATUT_LIST_LIMIT, since=None):
+    """
+    Retourne une page de la liste d'une file ([éléments], curseur suivant ou None).
+    Seuls les champs listés sont lus (jamais le contenu des briefs ou articles).
+    """
+    queue, id_key, fields, time_field = STATUT_LISTS[name]
+    rows, next_cursor = queue.page(after=cursor, limit=limit, since=since, time_field=time_field, fields=fields)
+    items = []
+    for job_id, values in rows:
+        if values.pop("is_temp", None):
+            continue
+        if "status" in values:
+            values["status"] = values["status"] or "pending"
+        items.append({id_key: job_id, **values})
+    return items, next_cursor
 
 @app.route('/statut', methods=['GET'])
 def statut():
     """
-    Endpoint pour vérifier l'état de l'API.
+    Endpoint pour vérifier l'état de l'API : compteurs et statistiques uniquement.
+    Avec details=true, ajoute les statistiques qui interrogent la base : entrées du cache
+    Keyword Planner et état des limiteurs de débit.
+    Listes paginées sur demande : list=pending_briefs,completed_content (files séparées par des virgules),
+    limit=N, since=timestamp, et <file>_cursor=... pour la page suivante (renvoyé dans <file>_next_cursor).
     """
-    return jsonify({
+    details = request.args.get('details', '').lower() in ('1', 'true', 'yes')
+    response = {
         "status": "online",
         "pending_briefs": len(pending_briefs),
         "completed_briefs": len(completed_briefs),
         "pending_content": len(pending_content),
         "completed_content": len(completed_content),
-        "pending_briefs_list": [{"brief_id": k, "keyword": v["keyword"]} for k, v in pending_briefs.items()],
-        "completed_briefs_list": [{"brief_id": k, "keyword": v["keyword"]} for k, v in completed_briefs.items() if not v.get("is_temp", False)],
-        "pending_content_list": [{"content_id": k, "brief_id": v["brief_id"]} for k, v in pending_content.items()],
-        "completed_content_list": [{"content_id": k, "brief_id": v["brief_id"], "keyword": completed_briefs[v["brief_id"]]["keyword"]} for k, v in completed_content.items()]
-    }), 200
+        "serp_cache": serp_cache.stats(),
+        "keyword_cache": keyword_cache.stats(entries=details),
+        "brief_reuse": brief_reuse_stats(),
+        "webhooks": webhooks.stats(),
+        "retention": retention_stats(),
+        "logging": logging_stats(),
+        "resident_bytes": {
+            "pending_briefs": pending_briefs.size_bytes(),
+            "completed_briefs": completed_briefs.size_bytes(),
+            "pending_content": pending_content.size_bytes(),
+            "completed_content": completed_content.size_bytes(),
+            "batches": batches.size_bytes(),
+            "webhooks": webhooks.queue.size_bytes(),
+            "webhooks_failed": webhooks.failed.size_bytes()
+        },
+        "single_flight": {
+            "serp": serp_flight.stats(),
+            "keyword": keyword_flight.stats()
+        }
+    }
+    if details:
+        response["rate_limits"] = limiter.stats()
+    
+    names = [name.strip() for name in request.args.get('list', '').split(',') if name.strip()]
+    if not names:
+        return jsonify(response), 200
+    
+    unknown = [name for name in names if name not in STATUT_LISTS]
+    if unknown:
+        return jsonify({"error": f"Unknown list: {', '.join(unknown)}", "lists": list(STATUT_LISTS)}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', STATUT_LIST_LIMIT)), STATUT_LIST_MAX_LIMIT))
+        since = float(request.args['since']) if request.args.get('since') else None
+        cursors = {name: int(request.args[f"{name}_cursor"]) if request.args.get(f"{name}_cursor") else None for name in names}
+    except ValueError:
+        return jsonify({"error": "limit, since and cursors must be numbers"}), 400
+    
+    for name in names:
+        items, next_cursor = statut_page(name, cursors[name], limit, since)
+        response[f"{name}_list"] = items
+        response[f"{name}_next_cursor"] = next_cursor
+    return jsonify(response), 200
 
 # Nouvelles routes pour le workflow SEO 2.0
 
@@ -564,26 +1581,31 @@ def statut():
 def envoyer_brief_redacteur():
     """
     Endpoint pour envoyer un brief à l'Assistant Rédacteur SEO.
+    callback_url (optionnel) reçoit le contenu rédigé (événement content.completed ou content.failed).
     """
     data = request.json
     if not data or not data.get('brief_id'):
         return jsonify({"error": "Brief ID is required"}), 400
 
     brief_id = data.get('brief_id')
+    callback_url = data.get('callback_url')
+    error = callback_url_error(callback_url) if callback_url else None
+    if error:
+        return jsonify({"error": error}), 400
     
     # Vérifier si le brief existe
     if brief_id not in completed_briefs:
         return jsonify({"error": f"Brief with ID {brief_id} not found"}), 404
     
-    # Créer un ID pour le contenu
-    content_id = f"content_{int(time.time())}"
-    
-    # Ajouter à la file d'attente des contenus en cours
-    pending_content[content_id] = {
+    # Créer le contenu dans la file d'attente des contenus en cours
+    content_entry = {
         "brief_id": brief_id,
         "status": "pending",
         "created_at": time.time()
     }
+    if callback_url:
+        content_entry["callback_url"] = callback_url
+    content_id = add_job(pending_content, "content", content_entry, taken=(completed_content,))
     
     # Format simplifié pour Make - les clés au premier niveau plutôt que dans un objet data
     return jsonify(
@@ -596,72 +1618,104 @@ def envoyer_brief_redacteur():
 def recuperer_contenu():
     """
     Endpoint pour récupérer un contenu rédigé.
+    Avec content_id et wait=N, attend jusqu'à N secondes la fin de la rédaction avant de répondre.
     """
     content_id = request.args.get('content_id')
     brief_id = request.args.get('brief_id')
+    try:
+        wait = long_poll_wait(request.args)
+    except ValueError:
+        return jsonify(error="wait must be a number of seconds"), 400
     
     # Si l'appel spécifie un content_id précis
     if content_id:
-        if content_id in completed_content:
+        if wait:
+            wait_for_job(pending_content, completed_content, content_id, wait)
+        content_data = completed_metadata(completed_content, content_id)
+        pending_data = pending_content.get(content_id) if content_data is None else None
+        if content_data is not None:
             # Extraire les données au niveau racine pour Make
-            response_data = completed_content[content_id].copy()
-            return jsonify(response_data), 200
-        elif content_id in pending_content:
+            return record_response(completed_content, content_id, content_data)
+        elif pending_data is not None:
+            status = pending_data.get("status", "pending")
+            if status == "failed":
+                return jsonify(
+                    status="failed",
+                    content_id=content_id,
+                    brief_id=pending_data["brief_id"],
+                    error=pending_data.get("error")
+                ), 500
             return jsonify(
-                status="pending",
+                status=status,
                 content_id=content_id,
-                brief_id=pending_content[content_id]["brief_id"]
+                brief_id=pending_data["brief_id"]
             ), 202
         else:
             return jsonify(error="Content not found"), 404
     
     # Si l'appel spécifie un brief_id précis
     elif brief_id:
-        matching = [c for c_id, c in completed_content.items() if c["brief_id"] == brief_id]
-        if matching:
-            return jsonify(matching[0]), 200
+        match = completed_content.find(brief_id, body=False)
+        if match:
+            return record_response(completed_content, *match)
         else:
             return jsonify(status="No completed content found for this brief"), 404
     
     # Sans paramètres, retourner le premier contenu complété
     else:
-        if completed_content:
-            cid = next(iter(completed_content))
-            response_data = completed_content[cid].copy()
-            return jsonify(response_data), 200
+        first = completed_content.first(body=False)
+        if first:
+            return record_response(completed_content, *first)
         else:
             return jsonify(status="No completed content available"), 204
 
-def generate_content_with_assistant(brief_id):
+def handle_content_tool_call(keyword, brief_content, function_name, function_args):
+    """
+    Traite un appel de fonction de l'Assistant Rédacteur et retourne son résultat.
+    """
+    if function_name == "getBrief":
+        # Lui renvoyer le même brief qu'on a déjà fourni
+        logger.warning("Assistant demande getBrief malgré le brief déjà fourni")
+        return {
+            "brief": brief_content,
+            "keyword": keyword,
+            "note": "Ce brief a déjà été fourni au début de la conversation"
+        }
+    return {}
+
+def build_content_message(keyword, brief_content):
+    """
+    Construit le message envoyé à l'Assistant Rédacteur avec le brief complet.
+    """
+    return f"""Voici le brief SEO complet pour le mot-clé '{keyword}':
+
+{brief_content}
+
+Utilise ce brief pour rédiger un contenu SEO optimisé. N'utilise pas la fonction getBrief car le brief complet est déjà fourni ci-dessus."""
+
+def generate_content_with_assistant(brief_id, on_delta=None):
     """
     Génère un contenu SEO en utilisant l'Assistant Rédacteur SEO.
+    on_delta(message_id, texte) reçoit le texte au fil de la rédaction (run en streaming).
     """
     try:
-        # Vérifier si le brief existe
-        if brief_id not in completed_briefs:
+        # Récupérer le brief
+        brief_data = completed_briefs.get(brief_id)
+        if brief_data is None:
             raise Exception(f"Brief with ID {brief_id} not found")
         
-        # Récupérer le brief
-        brief_data = completed_briefs[brief_id]
         keyword = brief_data["keyword"]
         brief_content = brief_data["brief"]
         
-        # Importer OpenAI
-        from openai import OpenAI
-        
-        # Créer le client OpenAI
-        client = OpenAI(api_key=API_KEY)
+        # Client partagé (pool de connexions réutilisé entre les appels)
+        client = get_openai_client()
         
         # 1. Créer une conversation (thread)
         thread = client.beta.threads.create()
         thread_id = thread.id
         
         # 2. Préparer un message avec le brief COMPLET
-        message_content = f"""Voici le brief SEO complet pour le mot-clé '{keyword}':
-
-{brief_content}
-
-Utilise ce brief pour rédiger un contenu SEO optimisé. N'utilise pas la fonction getBrief car le brief complet est déjà fourni ci-dessus."""
+        message_content = build_content_message(keyword, brief_content)
         
         # 3. Ajouter le message au thread
         client.beta.threads.messages.create(
@@ -670,91 +1724,19 @@ Utilise ce brief pour rédiger un contenu SEO optimisé. N'utilise pas la foncti
             content=message_content
         )
         
-        # 4. Exécuter l'assistant sur le thread
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=REDACTEUR_ASSISTANT_ID
+        # 4. Exécuter l'assistant sur le thread jusqu'à la fin du run
+        execute_run(
+            client,
+            thread_id,
+            REDACTEUR_ASSISTANT_ID,
+            lambda name, args: handle_content_tool_call(keyword, brief_content, name, args),
+            poll_interval=5,
+            label="Content generation run",
+            on_delta=on_delta
         )
         
-        # 5. Attendre que l'assistant termine son travail (boucle sans limite)
-        run_id = run.id
-        while True:
-            time.sleep(5)
-            
-            run = client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run_id
-            )
-            run_status = run.status
-            print(f"Content generation run status: {run_status}")
-            
-            if run_status == "completed":
-                break
-            elif run_status == "requires_action":
-                required_actions = run.required_action
-                if required_actions and required_actions.type == "submit_tool_outputs":
-                    tool_calls = required_actions.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-                    
-                    print(f"Content Assistant requires action with {len(tool_calls)} tool calls despite having the brief")
-                    
-                    for tool_call in tool_calls:
-                        tool_call_id = tool_call.id
-                        function_name = tool_call.function.name
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        print(f"Tool call: {function_name} with args: {function_args}")
-                        
-                        result = {}
-                        
-                        if function_name == "getBrief":
-                            # Lui renvoyer le même brief qu'on a déjà fourni
-                            print("Assistant demande getBrief malgré le brief déjà fourni")
-                            result = {
-                                "brief": brief_content,
-                                "keyword": keyword,
-                                "note": "Ce brief a déjà été fourni au début de la conversation"
-                            }
-                        
-                        output = json.dumps(result)
-                        
-                        tool_outputs.append({
-                            "tool_call_id": tool_call_id,
-                            "output": output
-                        })
-                    
-                    client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread_id,
-                        run_id=run_id,
-                        tool_outputs=tool_outputs
-                    )
-                    
-                    print(f"Submitted {len(tool_outputs)} tool outputs")
-                else:
-                    raise Exception(f"Unknown required action type: {required_actions.type if required_actions else 'None'}")
-            elif run_status in ["failed", "cancelled", "expired"]:
-                raise Exception(f"Assistant run failed with status: {run_status}")
-            
-            if run_status not in ["completed", "requires_action", "in_progress", "queued"]:
-                raise Exception(f"Unexpected status: {run_status}")
-        
-        # 6. Récupérer la réponse de l'assistant
-        messages = client.beta.threads.messages.list(
-            thread_id=thread_id
-        )
-        
-        # Récupérer la dernière réponse de l'assistant
-        content_text = None
-        
-        for message in messages.data:
-            if message.role == "assistant":
-                message_parts = []
-                for content_part in message.content:
-                    if content_part.type == "text":
-                        message_parts.append(content_part.text.value)
-                if message_parts:
-                    content_text = "\n".join(message_parts)
-                    break
+        # 5. Récupérer la dernière réponse de l'assistant
+        content_text = get_assistant_reply(client, thread_id)
         
         if not content_text:
             raise Exception("No assistant response found")
@@ -762,65 +1744,234 @@ Utilise ce brief pour rédiger un contenu SEO optimisé. N'utilise pas la foncti
         return content_text
         
     except Exception as e:
-        print(f"Error generating content with Redacteur assistant: {str(e)}")
+        logger.error("Error generating content with Redacteur assistant: %s", e)
         raise e
 
-@app.route('/genererContenu', methods=['GET'])
-def generer_contenu():
+def run_content_job(content_id, brief_id, on_delta=None):
     """
-    Traite la génération de contenu SEO à partir d'un brief.
+    Génère le contenu avec l'Assistant Rédacteur et l'enregistre.
+    Exécuté dans le pool de threads (ou directement en mode synchrone).
     """
-    content_id = request.args.get('content_id')
-    brief_id = request.args.get('brief_id')
+    try:
+        # Générer le contenu avec l'Assistant Rédacteur
+        logger.info("Generating content for brief ID: %s", brief_id)
+        content_text = generate_content_with_assistant(brief_id, on_delta)
+        
+        # Enregistrer le contenu généré
+        save_content(content_id, brief_id, content_text)
+        
+        return content_text
+    except Exception as e:
+        logger.exception("Error processing content: %s", e)
+        mark_job_failed(pending_content, content_id, f"Failed to process content: {str(e)}")
+        raise
+
+def save_content(content_id, brief_id, content_text):
+    """
+    Enregistre le contenu généré et le retire de la file d'attente.
+    """
+    logger.info("Saving content for brief ID: %s", brief_id)
+    with store.transaction():
+        completed_data = completed_content[content_id] = with_etag({
+            "brief_id": brief_id,
+            "content": content_text,
+            "status": "completed",
+            "completed_at": time.time(),
+            "keyword": completed_briefs.metadata(brief_id)["keyword"]
+        })
+        
+        # Supprimer de la file d'attente (et notifier la callback_url du job)
+        job_callback("content", content_id, pending_content.pop(content_id, None), completed_data)
+    notify_job_done()
+
+def claim_content_for_processing(content_id=None, brief_id=None):
+    """
+    Choisit le contenu à rédiger (content_id, brief_id ou premier en attente) et le réclame.
+    Retourne (content_id, brief_id, None), ou (content_id, brief_id, (payload, status))
+    si aucune rédaction n'est à lancer.
+    """
+    pending_data = pending_content.get(content_id) if content_id else None
     
     # Si un content_id spécifique est fourni
-    if content_id and content_id in pending_content:
-        brief_id = pending_content[content_id]["brief_id"]
+    if pending_data:
+        brief_id = pending_data["brief_id"]
     # Si un brief_id spécifique est fourni sans content_id
     elif brief_id and not content_id:
         # Vérifier si le contenu pour ce brief est déjà en attente
-        matching_content_ids = [cid for cid, c in pending_content.items() if c["brief_id"] == brief_id]
-        if matching_content_ids:
-            content_id = matching_content_ids[0]
+        match = pending_content.find(brief_id)
+        if match:
+            content_id = match[0]
         else:
             # Créer un nouveau content_id pour ce brief
-            content_id = f"content_{int(time.time())}"
-            pending_content[content_id] = {
+            content_id = add_job(pending_content, "content", {
                 "brief_id": brief_id,
                 "status": "pending",
                 "created_at": time.time()
-            }
+            }, taken=(completed_content,))
     # Sans paramètres suffisants
     else:
         if not brief_id and not content_id:
             # Prendre le premier contenu en attente
-            if pending_content:
-                content_id = next(iter(pending_content))
-                brief_id = pending_content[content_id]["brief_id"]
+            first = next_pending_job(pending_content, retry_failed=True)
+            if first:
+                content_id, pending_data = first
+                brief_id = pending_data["brief_id"]
             else:
-                return jsonify(status="No pending content to process"), 200
+                return None, None, ({"status": "No pending content to process"}, 200)
         elif content_id and content_id not in pending_content:
-            return jsonify(error=f"Content with ID {content_id} not found"), 404
+            return content_id, brief_id, ({"error": f"Content with ID {content_id} not found"}, 404)
     
-    try:
-        # Générer le contenu avec l'Assistant Rédacteur
-        print(f"Generating content for brief ID: {brief_id}")
-        content_text = generate_content_with_assistant(brief_id)
-        
-        # Enregistrer le contenu généré
-        print(f"Saving content for brief ID: {brief_id}")
-        completed_content[content_id] = {
+    pending_data = claim_job(pending_content, content_id, allow_retry=True)
+    if pending_data is None:
+        return content_id, brief_id, ({
+            "status": "processing",
+            "content_id": content_id,
             "brief_id": brief_id,
-            "content": content_text,
-            "status": "completed",
-            "completed_at": time.time(),
-            "keyword": completed_briefs[brief_id]["keyword"]
+            "status_url": f"/recupererContenu?content_id={content_id}"
+        }, 202)
+    return content_id, brief_id, None
+
+# Streaming SSE de /genererContenu : commentaire envoyé si rien n'a été transmis depuis N secondes
+# (les proxys et Make coupent les connexions silencieuses)
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event, data):
+    """
+    Formate un événement Server-Sent Events (données JSON sur une ligne).
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def wants_stream(args, headers):
+    return args.get('stream', '').lower() in ('1', 'true', 'yes') or "text/event-stream" in headers.get('Accept', '')
+
+class ContentStream:
+    """
+    Suit le texte transmis en direct pendant une rédaction et produit les événements SSE.
+    Le contenu enregistré est le dernier message de l'assistant : si le texte transmis
+    pour ce message diffère (flux coupé puis repli sur le polling), l'événement
+    "done" contient le contenu complet.
+    """
+
+    def __init__(self, content_id, brief_id):
+        self.content_id = content_id
+        self.brief_id = brief_id
+        self.messages = {}
+        self.last_message = None
+
+    def started(self):
+        return sse_event("started", {
+            "status": "processing",
+            "content_id": self.content_id,
+            "brief_id": self.brief_id,
+            "status_url": f"/recupererContenu?content_id={self.content_id}"
+        })
+
+    def delta(self, message_id, text):
+        self.messages[message_id] = self.messages.get(message_id, "") + text
+        self.last_message = message_id
+        return sse_event("delta", {"message_id": message_id, "text": text})
+
+    def done(self, content_text):
+        payload = {
+            "status": "Content generated successfully",
+            "content_id": self.content_id,
+            "brief_id": self.brief_id,
+            "status_url": f"/recupererContenu?content_id={self.content_id}"
         }
-        
-        # Supprimer de la file d'attente
-        if content_id in pending_content:
-            del pending_content[content_id]
-        
+        if self.messages.get(self.last_message, "").strip() != content_text.strip():
+            payload["content"] = content_text
+        return sse_event("done", payload)
+
+    def error(self, error):
+        return sse_event("error", {
+            "error": f"Failed to process content: {error}",
+            "content_id": self.content_id,
+            "brief_id": self.brief_id
+        })
+
+def stream_content_job(content_id, brief_id):
+    """
+    Lance la rédaction dans le pool de threads et retourne un générateur d'événements SSE,
+    ou None si le pool est saturé. Si le client se déconnecte, la rédaction continue
+    et le contenu est enregistré normalement.
+    """
+    events = Queue()
+
+    def job():
+        try:
+            content_text = run_content_job(content_id, brief_id, lambda message_id, text: events.put(("delta", (message_id, text))))
+            events.put(("done", content_text))
+        except Exception as e:
+            events.put(("error", str(e)))
+
+    if not submit_background(job):
+        return None
+
+    def generate():
+        stream = ContentStream(content_id, brief_id)
+        yield stream.started()
+        while True:
+            try:
+                kind, value = events.get(timeout=SSE_KEEPALIVE)
+            except Empty:
+                yield ": keepalive\n\n"
+                continue
+            if kind == "delta":
+                yield stream.delta(*value)
+            elif kind == "done":
+                yield stream.done(value)
+                return
+            else:
+                yield stream.error(value)
+                return
+
+    return generate()
+
+@app.route('/genererContenu', methods=['GET'])
+def generer_contenu():
+    """
+    Traite la génération de contenu SEO à partir d'un brief.
+    Par défaut, la rédaction part en tâche de fond et l'endpoint répond 202 ;
+    le résultat se récupère via /recupererContenu?content_id=...
+    Avec sync=true, l'endpoint attend la fin de la rédaction (ancien comportement).
+    Avec stream=true (ou Accept: text/event-stream), le texte est transmis au fil de
+    la rédaction en Server-Sent Events : started, delta..., puis done ou error.
+    En mode WSGI, un flux occupe un worker gunicorn pendant toute la rédaction
+    (préférer SERVER_MODE=asgi pour de nombreux flux simultanés).
+    Sans brief_id ni content_id, traite le premier contenu en attente ou, s'il n'y en
+    a plus, relance le plus ancien contenu en échec.
+    """
+    sync = request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+    stream = wants_stream(request.args, request.headers)
+    
+    content_id, brief_id, early = claim_content_for_processing(
+        request.args.get('content_id'),
+        request.args.get('brief_id')
+    )
+    if early:
+        return jsonify(early[0]), early[1]
+    
+    if stream:
+        events = stream_content_job(content_id, brief_id)
+        if events is None:
+            release_job(pending_content, content_id)
+            return jsonify(
+                error="Too many jobs in progress, retry later",
+                content_id=content_id,
+                brief_id=brief_id
+            ), 503
+        return Response(events, mimetype="text/event-stream", headers=SSE_HEADERS)
+    
+    if sync:
+        try:
+            content_text = run_content_job(content_id, brief_id)
+        except Exception as e:
+            return jsonify(
+                error=f"Failed to process content: {str(e)}",
+                content_id=content_id,
+                brief_id=brief_id
+            ), 500
         # Format simplifié pour Make
         return jsonify(
             status="Content generated successfully",
@@ -828,30 +1979,44 @@ def generer_contenu():
             brief_id=brief_id,
             content=content_text
         ), 200
-    except Exception as e:
-        print(f"Error processing content: {str(e)}")
+    
+    if not submit_background(run_content_job, content_id, brief_id):
+        release_job(pending_content, content_id)
         return jsonify(
-            error=f"Failed to process content: {str(e)}",
+            error="Too many jobs in progress, retry later",
             content_id=content_id,
             brief_id=brief_id
-        ), 500
+        ), 503
+    
+    return jsonify(
+        status="processing",
+        content_id=content_id,
+        brief_id=brief_id,
+        status_url=f"/recupererContenu?content_id={content_id}"
+    ), 202
 
 @app.route('/reset', methods=['POST'])
 def reset_statut():
     """
-    Efface tout l'historique (pending/completed) des briefs et contenus.
+    Efface tout l'historique (pending/completed) des briefs et contenus,
+    ainsi que les webhooks en attente ou en échec.
     """
     cleared = {
         "pending_briefs_cleared": len(pending_briefs),
-        "completed_briefs_cleared": len([b for b in completed_briefs.values() if not b.get("is_temp", False)]),
+        "completed_briefs_cleared": len([b for b in completed_briefs.values(body=False) if not b.get("is_temp", False)]),
         "pending_content_cleared": len(pending_content),
         "completed_content_cleared": len(completed_content),
+        "webhooks_cleared": len(webhooks.queue) + len(webhooks.failed),
     }
 
-    pending_briefs.clear()
-    completed_briefs.clear()
-    pending_content.clear()
-    completed_content.clear()
+    with store.transaction():
+        pending_briefs.clear()
+        completed_briefs.clear()
+        pending_content.clear()
+        completed_content.clear()
+        batches.clear()
+        webhooks.queue.clear()
+        webhooks.failed.clear()
 
     return jsonify({
         "status": "history_cleared",
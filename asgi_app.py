@@ -0,0 +1,733 @@
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qsl, urlencode
+from werkzeug.exceptions import InternalServerError
+from app import (
+    app as flask_app,
+    API_KEY,
+    ASSISTANT_ID,
+    REDACTEUR_ASSISTANT_ID,
+    OPENAI_TIMEOUT,
+    OPENAI_CONNECT_TIMEOUT,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_RETRIES,
+    KEYWORD_API_URL,
+    SERP_API_URL,
+    KEYWORD_CACHE_TTL,
+    KEYWORD_CACHE_ERROR_TTL,
+    normalize_keyword,
+    pending_briefs,
+    pending_content,
+    completed_briefs,
+    completed_content,
+    keyword_cache,
+    serp_cache,
+    keyword_data_error,
+    format_serp_data,
+    handle_brief_tool_call,
+    handle_content_tool_call,
+    build_brief_message,
+    build_content_message,
+    resolve_brief_reply,
+    fresh_prefetch,
+    save_brief,
+    save_content,
+    mark_job_failed,
+    release_job,
+    claim_brief_for_processing,
+    reuse_recent_brief,
+    brief_reused,
+    claim_content_for_processing,
+    SSE_KEEPALIVE,
+    SSE_HEADERS,
+    wants_stream,
+    ContentStream,
+    LONG_POLL_INTERVAL,
+    long_poll_wait,
+    job_settled,
+    start_batch,
+    restamp_job,
+    cancel_batch,
+    batch_started,
+    record_batch_outcome,
+    finish_batch,
+)
+from http_client import post_json_async
+from assistant_runner import execute_run_async, get_assistant_reply_async
+from rate_limit import AsyncRateLimitedTransport
+from cache import AsyncSingleFlight
+from tool_outputs import project_tool_output
+from logs import Payload
+
+# Mode de service asyncio (ASGI) : mêmes routes et mêmes réponses que l'application Flask.
+# Les runs Assistant, les appels Ngrok et les générations en tâche de fond tournent sur
+# la boucle d'événements : un run en attente n'occupe plus de thread.
+# Les accès au store, au cache Keyword Planner et au limiteur (SQLite, verrous possibles)
+# passent par asyncio.to_thread pour ne jamais bloquer la boucle.
+# Les autres routes (courtes) sont servies par l'application Flask dans un thread.
+# Lancement : uvicorn asgi_app:app (ou gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker)
+
+ASGI_MAX_JOBS = int(os.getenv("ASGI_MAX_JOBS", "500"))  # générations simultanées en tâche de fond
+background_tasks = set()
+logger = logging.getLogger(__name__)
+
+_async_openai_client = None
+_async_openai_client_loop = None
+
+def get_async_openai_client():
+    """
+    Retourne le client AsyncOpenAI de la boucle d'événements courante.
+    """
+    global _async_openai_client, _async_openai_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_openai_client is None or _async_openai_client_loop is not loop:
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            transport=AsyncRateLimitedTransport(
+                "openai",
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+                )
+            ),
+            follow_redirects=True
+        )
+        _async_openai_client = AsyncOpenAI(
+            api_key=API_KEY,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=http_client
+        )
+        _async_openai_client_loop = loop
+    return _async_openai_client
+
+# Regroupement des appels concurrents identiques (coroutines)
+keyword_flight_async = AsyncSingleFlight()
+serp_flight_async = AsyncSingleFlight()
+
+async def get_keyword_data_async(mot_cle):
+    """
+    Variante asyncio de get_keyword_data_from_api (même cache disque).
+    """
+    cache_key = normalize_keyword(mot_cle)
+    cached = await asyncio.to_thread(keyword_cache.get, cache_key)
+    if cached is not None:
+        return cached
+    return await keyword_flight_async.do(cache_key, load_keyword_data_async, mot_cle, cache_key)
+
+async def load_keyword_data_async(mot_cle, cache_key):
+    data = await fetch_keyword_data_async(mot_cle)
+    ttl = KEYWORD_CACHE_ERROR_TTL if data.get("error") else KEYWORD_CACHE_TTL
+    await asyncio.to_thread(keyword_cache.set, cache_key, data, ttl)
+    return data
+
+async def fetch_keyword_data_async(mot_cle):
+    try:
+        response = await post_json_async(KEYWORD_API_URL, {"mot_cle": mot_cle}, bucket="keyword")
+        response.raise_for_status()
+
+        data = response.json()
+        logger.debug("Keyword data received from Ngrok for '%s': %s", mot_cle, Payload(data))
+
+        return data
+    except Exception as e:
+        logger.error("Error getting keyword data for '%s': %s", mot_cle, e)
+        return keyword_data_error(mot_cle, e)
+
+async def get_serp_data_async(keyword):
+    """
+    Variante asyncio de get_serp_data_for_keyword (même cache SERP).
+    """
+    cache_key = normalize_keyword(keyword)
+    formatted_data = serp_cache.get(cache_key)
+    if formatted_data is None:
+        formatted_data = await serp_flight_async.do(cache_key, load_serp_data_async, keyword, cache_key)
+    formatted_data["query"] = keyword
+    return formatted_data
+
+async def load_serp_data_async(keyword, cache_key):
+    formatted_data = await fetch_serp_data_async(keyword)
+    if "error" not in formatted_data:
+        serp_cache.set(cache_key, formatted_data)
+    return formatted_data
+
+async def fetch_serp_data_async(keyword):
+    try:
+        response = await post_json_async(SERP_API_URL, {"query": keyword}, bucket="serp")
+        response.raise_for_status()
+
+        return format_serp_data(keyword, response.json())
+    except Exception as e:
+        logger.error("Error getting SERP data for keyword '%s': %s", keyword, e)
+        return {"query": keyword, "error": str(e)}
+
+async def fetch_brief_inputs_async(keyword):
+    """
+    Récupère simultanément les données SERP et Keyword Planner d'un mot-clé.
+    """
+    serp_data, keyword_data = await asyncio.gather(
+        get_serp_data_async(keyword),
+        get_keyword_data_async(keyword)
+    )
+    return serp_data, keyword_data
+
+async def handle_brief_tool_call_async(keyword, function_name, function_args):
+    """
+    Appels de fonction de l'Assistant GPT : SERP et Keyword Planner en asynchrone,
+    les autres (écritures locales rapides) comme en mode Flask.
+    """
+    if function_name == "getSERPResults":
+        return project_tool_output(function_name, await get_serp_data_async(function_args.get("query", keyword)))
+    elif function_name == "getKeywordData":
+        return project_tool_output(function_name, await get_keyword_data_async(function_args.get("mot_cle", keyword)))
+    return await asyncio.to_thread(handle_brief_tool_call, keyword, function_name, function_args)
+
+async def generate_brief_with_assistant_async(keyword, serp_data, keyword_data=None):
+    """
+    Variante asyncio de generate_brief_with_assistant.
+    """
+    try:
+        client = get_async_openai_client()
+
+        thread = await client.beta.threads.create()
+        thread_id = thread.id
+
+        message_content, prompt_tokens = build_brief_message(keyword, serp_data, keyword_data)
+        logger.info("Brief prompt for '%s': ~%s tokens", keyword, prompt_tokens)
+
+        await client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=message_content
+        )
+
+        await execute_run_async(
+            client,
+            thread_id,
+            ASSISTANT_ID,
+            lambda name, args: handle_brief_tool_call_async(keyword, name, args),
+            poll_interval=3,
+            label="Run"
+        )
+
+        reply = await get_assistant_reply_async(client, thread_id)
+        return await asyncio.to_thread(resolve_brief_reply, keyword, reply)
+
+    except Exception as e:
+        logger.error("Error generating brief with assistant: %s", e)
+        raise e
+
+async def run_brief_job_async(brief_id, keyword, prefetched=None):
+    """
+    Variante asyncio de run_brief_job.
+    """
+    try:
+        prefetched = fresh_prefetch(prefetched)
+        if prefetched:
+            logger.info("Using prefetched SERP data for keyword: %s", keyword)
+            serp_data = prefetched["serp_data"]
+            keyword_data = prefetched.get("keyword_data") or {"error": "missing"}
+            if keyword_data.get("error"):
+                keyword_data = await get_keyword_data_async(keyword)
+        else:
+            logger.info("Getting SERP and keyword data for keyword: %s", keyword)
+            serp_data, keyword_data = await fetch_brief_inputs_async(keyword)
+
+        logger.info("Generating brief with Assistant for keyword: %s", keyword)
+        brief_content = await generate_brief_with_assistant_async(keyword, serp_data, keyword_data)
+
+        await asyncio.to_thread(save_brief, brief_id, keyword, brief_content)
+
+        return brief_content
+    except Exception as e:
+        logger.exception("Error processing brief: %s", e)
+        await asyncio.to_thread(mark_job_failed, pending_briefs, brief_id, f"Failed to process brief: {str(e)}")
+        raise
+
+async def generate_content_with_assistant_async(brief_id, on_delta=None):
+    """
+    Variante asyncio de generate_content_with_assistant.
+    """
+    try:
+        brief_data = await asyncio.to_thread(completed_briefs.get, brief_id)
+        if brief_data is None:
+            raise Exception(f"Brief with ID {brief_id} not found")
+
+        keyword = brief_data["keyword"]
+        brief_content = brief_data["brief"]
+
+        async def handle_tool_call(name, args):
+            return await asyncio.to_thread(handle_content_tool_call, keyword, brief_content, name, args)
+
+        client = get_async_openai_client()
+
+        thread = await client.beta.threads.create()
+        thread_id = thread.id
+
+        await client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=build_content_message(keyword, brief_content)
+        )
+
+        await execute_run_async(
+            client,
+            thread_id,
+            REDACTEUR_ASSISTANT_ID,
+            handle_tool_call,
+            poll_interval=5,
+            label="Content generation run",
+            on_delta=on_delta
+        )
+
+        content_text = await get_assistant_reply_async(client, thread_id)
+
+        if not content_text:
+            raise Exception("No assistant response found")
+
+        return content_text
+
+    except Exception as e:
+        logger.error("Error generating content with Redacteur assistant: %s", e)
+        raise e
+
+async def run_content_job_async(content_id, brief_id, on_delta=None):
+    """
+    Variante asyncio de run_content_job.
+    """
+    try:
+        logger.info("Generating content for brief ID: %s", brief_id)
+        content_text = await generate_content_with_assistant_async(brief_id, on_delta)
+
+        await asyncio.to_thread(save_content, content_id, brief_id, content_text)
+
+        return content_text
+    except Exception as e:
+        logger.exception("Error processing content: %s", e)
+        await asyncio.to_thread(mark_job_failed, pending_content, content_id, f"Failed to process content: {str(e)}")
+        raise
+
+async def run_batch_async(batch_id, jobs, concurrency, force=False):
+    """
+    Variante asyncio de submit_batch : au plus `concurrency` briefs générés simultanément.
+    """
+    started_at = time.time()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process_one(job):
+        brief_id, brief_data = job
+        async with semaphore:
+            brief_started_at = time.time()
+            try:
+                if await asyncio.to_thread(restamp_job, pending_briefs, brief_id, brief_data["started_at"]) is None:
+                    return await asyncio.to_thread(record_batch_outcome, batch_id, brief_id, brief_data, brief_started_at, skipped=True)
+                reused = await asyncio.to_thread(reuse_recent_brief, brief_id, brief_data["keyword"], force or brief_data.get("force", False))
+                error = None
+                if not reused:
+                    try:
+                        await run_brief_job_async(brief_id, brief_data["keyword"], brief_data.get("prefetch"))
+                    except Exception as e:
+                        error = e
+                return await asyncio.to_thread(record_batch_outcome, batch_id, brief_id, brief_data, brief_started_at, error, reused)
+            except Exception as e:
+                logger.exception("Batch %s: error on brief %s: %s", batch_id, brief_id, e)
+                return {"keyword": brief_data["keyword"], "status": "failed", "error": str(e)}
+
+    outcomes = await asyncio.gather(*(process_one(job) for job in jobs))
+    return await asyncio.to_thread(finish_batch, batch_id, outcomes, started_at)
+
+def stream_content_job_async(content_id, brief_id):
+    """
+    Variante asyncio de stream_content_job : la rédaction tourne en tâche de fond
+    sur la boucle, le générateur retourné produit les événements SSE (en octets).
+    """
+    events = asyncio.Queue()
+
+    async def job():
+        try:
+            content_text = await run_content_job_async(content_id, brief_id, lambda message_id, text: events.put_nowait(("delta", (message_id, text))))
+            events.put_nowait(("done", content_text))
+        except Exception as e:
+            events.put_nowait(("error", str(e)))
+
+    if not submit_task(job):
+        return None
+
+    async def generate():
+        stream = ContentStream(content_id, brief_id)
+        yield stream.started().encode("utf-8")
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(events.get(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if kind == "delta":
+                yield stream.delta(*value).encode("utf-8")
+            elif kind == "done":
+                yield stream.done(value).encode("utf-8")
+                return
+            else:
+                yield stream.error(value).encode("utf-8")
+                return
+
+    return generate()
+
+def _task_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()  # déjà enregistrée dans le job (statut "failed")
+
+def submit_task(fn, *args):
+    """
+    Lance une génération en tâche de fond sur la boucle. Retourne False si
+    ASGI_MAX_JOBS générations sont déjà en cours.
+    """
+    if len(background_tasks) >= ASGI_MAX_JOBS:
+        return False
+    task = asyncio.ensure_future(fn(*args))
+    background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return True
+
+class Request:
+    """
+    Requête HTTP reçue par l'application ASGI (sous-ensemble de flask.Request).
+    """
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.body = body
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        self.args = {}
+        for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+            self.args.setdefault(name, value)
+
+    def get_json(self, silent=False):
+        mimetype = self.headers.get("content-type", "").split(";")[0].strip().lower()
+        if mimetype != "application/json" and not (mimetype.startswith("application/") and mimetype.endswith("+json")):
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            if silent:
+                return None
+            raise
+
+def sse_response(events):
+    """
+    Réponse Server-Sent Events : le corps est un générateur asynchrone, envoyé morceau par morceau.
+    """
+    headers = [("Content-Type", "text/event-stream; charset=utf-8"), *SSE_HEADERS.items()]
+    return 200, headers, events
+
+def json_response(payload, status=200):
+    """
+    Réponse JSON produite par le même encodeur que jsonify (octets identiques au mode Flask).
+    """
+    response = flask_app.json.response(payload)
+    return status, list(response.headers.items()), response.get_data()
+
+def _werkzeug_response(response):
+    return response.status_code, list(response.headers.items()), response.get_data()
+
+# Routes servies nativement en asyncio (appels réseau longs)
+
+async def get_keyword_data(request):
+    mot_cle = request.args.get('mot_cle')
+    if not mot_cle:
+        return json_response({"error": "Parameter 'mot_cle' is required"}, 400)
+
+    try:
+        keyword_data = await get_keyword_data_async(mot_cle)
+        logger.info("Returning keyword data for '%s' to Assistant GPT", mot_cle)
+
+        return json_response(keyword_data, 200)
+    except Exception as e:
+        logger.exception("Unexpected error in getKeywordData: %s", e)
+        return json_response({"error": f"Unexpected error: {str(e)}"}, 500)
+
+async def get_serp_results(request):
+    query = request.args.get('query')
+    if not query:
+        return json_response({"error": "Query parameter is required"}, 400)
+
+    try:
+        formatted_data = await get_serp_data_async(query)
+        logger.debug("SERP data for query '%s': %s", query, Payload(formatted_data))
+
+        return json_response(formatted_data, 200)
+    except Exception as e:
+        logger.exception("Unexpected error in getSERPResults: %s", e)
+        return json_response({"error": f"Unexpected error: {str(e)}"}, 500)
+
+async def process_queue(request):
+    sync = request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+
+    brief_id, brief_data, early = await asyncio.to_thread(claim_brief_for_processing, request.args.get('brief_id'))
+    if early:
+        return json_response(*early)
+    keyword = brief_data["keyword"]
+
+    reused = await asyncio.to_thread(reuse_recent_brief, brief_id, keyword, force or brief_data.get("force", False))
+    if reused:
+        return json_response(brief_reused(brief_id, reused), 200)
+
+    if sync:
+        try:
+            brief_content = await run_brief_job_async(brief_id, keyword, brief_data.get("prefetch"))
+        except Exception as e:
+            return json_response({
+                "error": f"Failed to process brief: {str(e)}",
+                "brief_id": brief_id
+            }, 500)
+        return json_response({
+            "status": "Brief processed successfully",
+            "brief_id": brief_id,
+            "brief": brief_content
+        }, 200)
+
+    if not submit_task(run_brief_job_async, brief_id, keyword, brief_data.get("prefetch")):
+        await asyncio.to_thread(release_job, pending_briefs, brief_id)
+        return json_response({
+            "error": "Too many jobs in progress, retry later",
+            "brief_id": brief_id
+        }, 503)
+
+    return json_response({
+        "status": "processing",
+        "brief_id": brief_id,
+        "keyword": keyword,
+        "status_url": f"/recupererBrief?brief_id={brief_id}"
+    }, 202)
+
+async def process_batch(request):
+    data = request.get_json(silent=True) or {}
+    batch_id, jobs, concurrency, early = await asyncio.to_thread(start_batch, data)
+    if early:
+        return json_response(*early)
+
+    force = bool(data.get('force'))
+    if data.get('wait'):
+        batch = await run_batch_async(batch_id, jobs, concurrency, force)
+        return json_response({"batch_id": batch_id, **batch}, 200)
+
+    if not submit_task(run_batch_async, batch_id, jobs, concurrency, force):
+        await asyncio.to_thread(cancel_batch, batch_id, jobs)
+        return json_response({"error": "Too many jobs in progress, retry later"}, 503)
+
+    return json_response(batch_started(batch_id, jobs, concurrency), 202)
+
+async def generer_contenu(request):
+    sync = request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+    stream = wants_stream(request.args, {"Accept": request.headers.get("accept", "")})
+
+    content_id, brief_id, early = await asyncio.to_thread(
+        claim_content_for_processing,
+        request.args.get('content_id'),
+        request.args.get('brief_id')
+    )
+    if early:
+        return json_response(*early)
+
+    if stream:
+        events = stream_content_job_async(content_id, brief_id)
+        if events is None:
+            await asyncio.to_thread(release_job, pending_content, content_id)
+            return json_response({
+                "error": "Too many jobs in progress, retry later",
+                "content_id": content_id,
+                "brief_id": brief_id
+            }, 503)
+        return sse_response(events)
+
+    if sync:
+        try:
+            content_text = await run_content_job_async(content_id, brief_id)
+        except Exception as e:
+            return json_response({
+                "error": f"Failed to process content: {str(e)}",
+                "content_id": content_id,
+                "brief_id": brief_id
+            }, 500)
+        return json_response({
+            "status": "Content generated successfully",
+            "content_id": content_id,
+            "brief_id": brief_id,
+            "content": content_text
+        }, 200)
+
+    if not submit_task(run_content_job_async, content_id, brief_id):
+        await asyncio.to_thread(release_job, pending_content, content_id)
+        return json_response({
+            "error": "Too many jobs in progress, retry later",
+            "content_id": content_id,
+            "brief_id": brief_id
+        }, 503)
+
+    return json_response({
+        "status": "processing",
+        "content_id": content_id,
+        "brief_id": brief_id,
+        "status_url": f"/recupererContenu?content_id={content_id}"
+    }, 202)
+
+ROUTES = {
+    ("GET", "/getKeywordData"): get_keyword_data,
+    ("GET", "/getSERPResults"): get_serp_results,
+    ("GET", "/process"): process_queue,
+    ("POST", "/processBatch"): process_batch,
+    ("GET", "/genererContenu"): generer_contenu,
+}
+
+# Long-poll (wait=) des routes de récupération : l'attente se fait sur la boucle,
+# puis la requête (sans wait) est servie par Flask
+LONG_POLL_ROUTES = {
+    "/recupererBrief": ("brief_id", pending_briefs, completed_briefs),
+    "/recupererContenu": ("content_id", pending_content, completed_content),
+}
+
+async def wait_for_job_async(scope):
+    """
+    Variante asyncio de wait_for_job pour une requête avec wait=. Retourne le scope
+    à transmettre à Flask (sans wait, ou inchangé si wait est invalide : Flask répond 400).
+    """
+    id_param, pending_queue, completed_queue = LONG_POLL_ROUTES[scope["path"]]
+    params = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    args = {}
+    for name, value in params:
+        args.setdefault(name, value)
+    try:
+        wait = long_poll_wait(args)
+    except ValueError:
+        return scope
+    job_id = args.get(id_param)
+    if job_id and wait:
+        deadline = time.time() + wait
+        while not await asyncio.to_thread(job_settled, pending_queue, completed_queue, job_id):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, LONG_POLL_INTERVAL))
+    query = urlencode([(name, value) for name, value in params if name != "wait"])
+    return {**scope, "query_string": query.encode("latin-1")}
+
+def wsgi_environ(scope, body):
+    """
+    Construit l'environnement WSGI d'une requête ASGI (routes servies par Flask).
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # Le corps est déjà lu en entier (y compris s'il a été envoyé en chunked)
+    environ["CONTENT_LENGTH"] = str(len(body))
+    environ.pop("HTTP_TRANSFER_ENCODING", None)
+    return environ
+
+def call_flask(environ):
+    """
+    Exécute la requête dans l'application Flask et retourne (status, headers, body).
+    """
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result["status"] = int(status.split(" ", 1)[0])
+        result["headers"] = headers
+
+    chunks = flask_app(environ, start_response)
+    try:
+        body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return result["status"], result["headers"], body
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return body
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Les jobs interrompus restent "processing" et sont repris après JOB_STALE_AFTER
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    """
+    Point d'entrée ASGI.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = await read_body(receive)
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        if scope["method"] == "GET" and scope["path"] in LONG_POLL_ROUTES:
+            scope = await wait_for_job_async(scope)
+        status, headers, content = await asyncio.to_thread(call_flask, wsgi_environ(scope, body))
+    else:
+        try:
+            status, headers, content = await handler(Request(scope, body))
+        except Exception as e:
+            logger.exception("Unexpected error on %s: %s", scope["path"], e)
+            status, headers, content = _werkzeug_response(InternalServerError().get_response())
+
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    })
+    if isinstance(content, bytes):
+        await send({"type": "http.response.body", "body": content})
+        return
+    # Corps en flux (SSE) : chaque morceau est envoyé dès qu'il est produit.
+    # Si le client se déconnecte, la génération en tâche de fond continue.
+    async for chunk in content:
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
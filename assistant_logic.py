@@ -166,7 +166,8 @@ def test_generer_contenu(content_id=None, brief_id=None):
     Fonction de test pour simuler l'appel à genererContenu.
     """
     try:
-        params = {}
+        # sync=true : attendre la rédaction (sinon l'endpoint répond 202 immédiatement)
+        params = {"sync": "true"}
         if content_id:
             params["content_id"] = content_id
         if brief_id:
@@ -220,10 +221,11 @@ def test_content_workflow(brief_id=None):
     # 1. Si aucun brief_id n'est fourni, récupérer un brief complété
     if not brief_id:
         # Vérifier les briefs complétés
-        response = requests.get(f"{API_BASE_URL}/statut")
+        # Les listes ne sont renvoyées que sur demande (première page, briefs temporaires exclus)
+        response = requests.get(f"{API_BASE_URL}/statut", params={"list": "completed_briefs"})
         if response.status_code == 200:
             data = response.json()
-            if data.get("completed_briefs", 0) > 0 and "completed_briefs_list" in data:
+            if data.get("completed_briefs_list"):
                 brief_id = data["completed_briefs_list"][0]["brief_id"]
                 print(f"Using first completed brief: {brief_id}")
             else:
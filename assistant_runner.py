@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logs import Payload
+
+# Mode d'exécution des runs : "poll" (interrogation périodique) ou "stream" (événements)
+ASSISTANT_RUN_MODE = os.getenv("ASSISTANT_RUN_MODE", "poll").lower()
+
+# Appels de fonction d'une même étape exécutés en parallèle. Le pool est partagé par tous
+# les runs du processus : par défaut 4 appels simultanés par job (tâches de fond + requête en cours)
+TOOL_CALLS_PER_JOB = 4
+TOOL_CALL_WORKERS = int(os.getenv("TOOL_CALL_WORKERS", str((int(os.getenv("BACKGROUND_WORKERS", "4")) + 1) * TOOL_CALLS_PER_JOB)))
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "90"))  # secondes par appel, à partir de son démarrage
+TOOL_CALL_QUEUE_TIMEOUT = float(os.getenv("TOOL_CALL_QUEUE_TIMEOUT", "300"))  # attente maximale d'un thread libre
+TOOL_CALL_CHECK_INTERVAL = 0.5  # vérification du démarrage des appels en file
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="tool")
+logger = logging.getLogger(__name__)
+
+
+class ToolCall:
+    """
+    Appel de fonction confié au pool ; started_at est fixé quand un thread le prend en charge.
+    """
+
+    def __init__(self, handle_tool_call, function_name, function_args):
+        self.started_at = None
+        self.future = tool_executor.submit(self._run, handle_tool_call, function_name, function_args)
+
+    def _run(self, handle_tool_call, function_name, function_args):
+        self.started_at = time.monotonic()
+        return handle_tool_call(function_name, function_args)
+
+    def expired(self, now):
+        return self.started_at is not None and now - self.started_at >= TOOL_CALL_TIMEOUT
+
+
+def wait_tool_calls(calls):
+    """
+    Attend la fin des appels. Chaque appel dispose de TOOL_CALL_TIMEOUT secondes à partir
+    de son démarrage (l'attente d'un thread libre n'est pas décomptée) ; un appel encore
+    en file après TOOL_CALL_QUEUE_TIMEOUT secondes est annulé.
+    """
+    queued_until = time.monotonic() + TOOL_CALL_QUEUE_TIMEOUT
+    while True:
+        now = time.monotonic()
+        pending = [call for call in calls if not call.future.done()]
+        queued = [call for call in pending if call.started_at is None]
+        running = [call for call in pending if call.started_at is not None and not call.expired(now)]
+        if not running and (not queued or now >= queued_until):
+            break
+        deadlines = [call.started_at + TOOL_CALL_TIMEOUT for call in running]
+        if queued:
+            deadlines.append(min(queued_until, now + TOOL_CALL_CHECK_INTERVAL))
+        wait([call.future for call in pending], timeout=max(0.0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+    for call in calls:
+        call.future.cancel()  # libère la file ; sans effet sur un appel déjà démarré
+
+
+class StreamInterrupted(Exception):
+    """
+    Le flux d'événements s'est coupé avant la fin du run (erreur réseau).
+    """
+
+    def __init__(self, run_id, cause):
+        super().__init__(str(cause))
+        self.run_id = run_id
+
+
+def build_tool_outputs(tool_calls, handle_tool_call):
+    """
+    Exécute en parallèle les appels de fonction demandés par l'assistant et
+    retourne la liste tool_outputs à soumettre (dans l'ordre des tool_calls).
+    Un appel qui dépasse TOOL_CALL_TIMEOUT (ou reste en file trop longtemps)
+    est soumis avec une erreur, pour ne pas bloquer les autres résultats.
+    """
+    calls = []
+    for tool_call in tool_calls:
+        function_name = tool_call.function.name
+        function_args = json.loads(tool_call.function.arguments)
+
+        logger.info("Tool call: %s with args: %s", function_name, Payload(function_args))
+
+        calls.append(ToolCall(handle_tool_call, function_name, function_args))
+
+    wait_tool_calls(calls)
+
+    tool_outputs = []
+    for tool_call, call in zip(tool_calls, calls):
+        future = call.future
+        if future.done() and not future.cancelled():
+            result = future.result()  # une exception dans un appel fait échouer le run, comme avant
+        elif future.cancelled():
+            logger.warning("Tool call %s (%s) not started after %ss", tool_call.function.name, tool_call.id, TOOL_CALL_QUEUE_TIMEOUT)
+            result = {"error": f"Tool call not started after {TOOL_CALL_QUEUE_TIMEOUT} seconds"}
+        else:
+            logger.warning("Tool call %s (%s) timed out after %ss", tool_call.function.name, tool_call.id, TOOL_CALL_TIMEOUT)
+            result = {"error": f"Tool call timed out after {TOOL_CALL_TIMEOUT} seconds"}
+        tool_outputs.append({
+            "tool_call_id": tool_call.id,
+            "output": json.dumps(result)
+        })
+    return tool_outputs
+
+
+def _required_tool_calls(run):
+    required_actions = run.required_action
+    if required_actions and required_actions.type == "submit_tool_outputs":
+        return required_actions.submit_tool_outputs.tool_calls
+    raise Exception(f"Unknown required action type: {required_actions.type if required_actions else 'None'}")
+
+
+def poll_run(client, thread_id, run_id, handle_tool_call, poll_interval, label):
+    """
+    Attend la fin du run en l'interrogeant toutes les poll_interval secondes (boucle sans limite).
+    """
+    while True:
+        time.sleep(poll_interval)  # éviter trop de requêtes
+        run = client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run_id
+        )
+        run_status = run.status
+        logger.info("%s status: %s", label, run_status, extra={"sample": "run_status"})
+
+        if run_status == "completed":
+            return run
+        elif run_status == "requires_action":
+            # Gérer l'action requise - approuver automatiquement les fonctions
+            tool_calls = _required_tool_calls(run)
+            logger.info("%s requires action with %s tool calls", label, len(tool_calls))
+            tool_outputs = build_tool_outputs(tool_calls, handle_tool_call)
+            client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run_id,
+                tool_outputs=tool_outputs
+            )
+            logger.info("Submitted %s tool outputs", len(tool_outputs))
+        elif run_status in ["failed", "cancelled", "expired"]:
+            raise Exception(f"Assistant run failed with status: {run_status}")
+
+        if run_status not in ["completed", "requires_action", "in_progress", "queued"]:
+            raise Exception(f"Unexpected status: {run_status}")
+
+
+def stream_run(client, thread_id, assistant_id, handle_tool_call, label, on_delta=None):
+    """
+    Exécute le run en mode streaming : les actions requises et la fin du run
+    sont traitées dès réception de l'événement, sans délai de polling.
+    on_delta(message_id, texte) reçoit le texte des messages au fil de leur rédaction.
+    """
+    import httpx
+    import openai
+
+    run_id = None
+    stream_manager = client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id
+    )
+    while stream_manager is not None:
+        next_manager = None
+        try:
+            with stream_manager as stream:
+                for event in stream:
+                    if event.event == "thread.run.created":
+                        run_id = event.data.id
+                    elif event.event == "thread.message.delta":
+                        if on_delta:
+                            _forward_delta(event.data, on_delta)
+                    elif event.event == "thread.run.requires_action":
+                        run = event.data
+                        run_id = run.id
+                        tool_calls = _required_tool_calls(run)
+                        logger.info("%s requires action with %s tool calls", label, len(tool_calls))
+                        tool_outputs = build_tool_outputs(tool_calls, handle_tool_call)
+                        next_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                            thread_id=thread_id,
+                            run_id=run_id,
+                            tool_outputs=tool_outputs
+                        )
+                        logger.info("Submitted %s tool outputs", len(tool_outputs))
+                    elif event.event == "thread.run.completed":
+                        logger.info("%s status: completed", label)
+                        return event.data
+                    elif event.event in ["thread.run.failed", "thread.run.cancelled", "thread.run.expired"]:
+                        raise Exception(f"Assistant run failed with status: {event.data.status}")
+                    elif event.event == "thread.run.incomplete":
+                        raise Exception(f"Unexpected status: {event.data.status}")
+        except (openai.APIConnectionError, httpx.TransportError) as e:
+            raise StreamInterrupted(run_id, e)
+        stream_manager = next_manager
+    # Flux terminé sans événement de fin : laisser le polling conclure
+    raise StreamInterrupted(run_id, "stream ended before run completion")
+
+
+def _forward_delta(message_delta, on_delta):
+    for content_part in message_delta.delta.content or []:
+        if content_part.type == "text" and content_part.text and content_part.text.value:
+            on_delta(message_delta.id, content_part.text.value)
+
+
+def _latest_run_id(runs_page):
+    return runs_page.data[0].id if runs_page.data else None
+
+
+def execute_run(client, thread_id, assistant_id, handle_tool_call, poll_interval, label, on_delta=None):
+    """
+    Exécute l'assistant sur le thread jusqu'à la fin du run, en mode streaming
+    si ASSISTANT_RUN_MODE=stream ou si on_delta est fourni, sinon (ou en cas
+    de coupure du flux) par polling. Après une coupure, on_delta n'est plus appelé.
+    Le thread est propre au job : après une coupure survenue avant l'événement
+    thread.run.created, le run éventuellement créé est retrouvé sur le thread
+    et suivi par polling plutôt que d'en lancer un second.
+    """
+    if (ASSISTANT_RUN_MODE == "stream" or on_delta) and hasattr(client.beta.threads.runs, "stream"):
+        try:
+            return stream_run(client, thread_id, assistant_id, handle_tool_call, label, on_delta)
+        except StreamInterrupted as e:
+            logger.warning("%s stream interrupted (%s), falling back to polling", label, e)
+            run_id = e.run_id or _latest_run_id(client.beta.threads.runs.list(thread_id=thread_id, limit=1, order="desc"))
+            if run_id:
+                return poll_run(client, thread_id, run_id, handle_tool_call, poll_interval, label)
+
+    run = client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id
+    )
+    return poll_run(client, thread_id, run.id, handle_tool_call, poll_interval, label)
+
+
+def get_assistant_reply(client, thread_id):
+    """
+    Retourne le texte de la dernière réponse de l'assistant dans le thread, ou None.
+    """
+    messages = client.beta.threads.messages.list(
+        thread_id=thread_id
+    )
+    return _assistant_text(messages)
+
+
+def _assistant_text(messages):
+    for message in messages.data:
+        if message.role == "assistant":
+            message_parts = []
+            for content_part in message.content:
+                if content_part.type == "text":
+                    message_parts.append(content_part.text.value)
+            if message_parts:
+                return "\n".join(message_parts)
+    return None
+
+
+# Variantes asyncio (mode ASGI, client AsyncOpenAI) : mêmes étapes que ci-dessus,
+# les attentes et les appels de fonction ne bloquent pas de thread.
+
+async def build_tool_outputs_async(tool_calls, handle_tool_call):
+    """
+    Variante asyncio de build_tool_outputs ; handle_tool_call est une coroutine.
+    """
+    calls = []
+    for tool_call in tool_calls:
+        function_name = tool_call.function.name
+        function_args = json.loads(tool_call.function.arguments)
+
+        logger.info("Tool call: %s with args: %s", function_name, Payload(function_args))
+
+        calls.append(asyncio.ensure_future(handle_tool_call(function_name, function_args)))
+
+    await asyncio.wait(calls, timeout=TOOL_CALL_TIMEOUT)
+
+    tool_outputs = []
+    for tool_call, call in zip(tool_calls, calls):
+        if call.done():
+            result = call.result()
+        else:
+            call.cancel()
+            logger.warning("Tool call %s (%s) timed out after %ss", tool_call.function.name, tool_call.id, TOOL_CALL_TIMEOUT)
+            result = {"error": f"Tool call timed out after {TOOL_CALL_TIMEOUT} seconds"}
+        tool_outputs.append({
+            "tool_call_id": tool_call.id,
+            "output": json.dumps(result)
+        })
+    return tool_outputs
+
+
+async def poll_run_async(client, thread_id, run_id, handle_tool_call, poll_interval, label):
+    """
+    Variante asyncio de poll_run.
+    """
+    while True:
+        await asyncio.sleep(poll_interval)
+        run = await client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run_id
+        )
+        run_status = run.status
+        logger.info("%s status: %s", label, run_status, extra={"sample": "run_status"})
+
+        if run_status == "completed":
+            return run
+        elif run_status == "requires_action":
+            tool_calls = _required_tool_calls(run)
+            logger.info("%s requires action with %s tool calls", label, len(tool_calls))
+            tool_outputs = await build_tool_outputs_async(tool_calls, handle_tool_call)
+            await client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run_id,
+                tool_outputs=tool_outputs
+            )
+            logger.info("Submitted %s tool outputs", len(tool_outputs))
+        elif run_status in ["failed", "cancelled", "expired"]:
+            raise Exception(f"Assistant run failed with status: {run_status}")
+
+        if run_status not in ["completed", "requires_action", "in_progress", "queued"]:
+            raise Exception(f"Unexpected status: {run_status}")
+
+
+async def stream_run_async(client, thread_id, assistant_id, handle_tool_call, label, on_delta=None):
+    """
+    Variante asyncio de stream_run.
+    """
+    import httpx
+    import openai
+
+    run_id = None
+    stream_manager = client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id
+    )
+    while stream_manager is not None:
+        next_manager = None
+        try:
+            async with stream_manager as stream:
+                async for event in stream:
+                    if event.event == "thread.run.created":
+                        run_id = event.data.id
+                    elif event.event == "thread.message.delta":
+                        if on_delta:
+                            _forward_delta(event.data, on_delta)
+                    elif event.event == "thread.run.requires_action":
+                        run = event.data
+                        run_id = run.id
+                        tool_calls = _required_tool_calls(run)
+                        logger.info("%s requires action with %s tool calls", label, len(tool_calls))
+                        tool_outputs = await build_tool_outputs_async(tool_calls, handle_tool_call)
+                        next_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                            thread_id=thread_id,
+                            run_id=run_id,
+                            tool_outputs=tool_outputs
+                        )
+                        logger.info("Submitted %s tool outputs", len(tool_outputs))
+                    elif event.event == "thread.run.completed":
+                        logger.info("%s status: completed", label)
+                        return event.data
+                    elif event.event in ["thread.run.failed", "thread.run.cancelled", "thread.run.expired"]:
+                        raise Exception(f"Assistant run failed with status: {event.data.status}")
+                    elif event.event == "thread.run.incomplete":
+                        raise Exception(f"Unexpected status: {event.data.status}")
+        except (openai.APIConnectionError, httpx.TransportError) as e:
+            raise StreamInterrupted(run_id, e)
+        stream_manager = next_manager
+    raise StreamInterrupted(run_id, "stream ended before run completion")
+
+
+async def execute_run_async(client, thread_id, assistant_id, handle_tool_call, poll_interval, label, on_delta=None):
+    """
+    Variante asyncio de execute_run (client AsyncOpenAI).
+    """
+    if (ASSISTANT_RUN_MODE == "stream" or on_delta) and hasattr(client.beta.threads.runs, "stream"):
+        try:
+            return await stream_run_async(client, thread_id, assistant_id, handle_tool_call, label, on_delta)
+        except StreamInterrupted as e:
+            logger.warning("%s stream interrupted (%s), falling back to polling", label, e)
+            run_id = e.run_id or _latest_run_id(await client.beta.threads.runs.list(thread_id=thread_id, limit=1, order="desc"))
+            if run_id:
+                return await poll_run_async(client, thread_id, run_id, handle_tool_call, poll_interval, label)
+
+    run = await client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id
+    )
+    return await poll_run_async(client, thread_id, run.id, handle_tool_call, poll_interval, label)
+
+
+async def get_assistant_reply_async(client, thread_id):
+    """
+    Variante asyncio de get_assistant_reply.
+    """
+    messages = await client.beta.threads.messages.list(
+        thread_id=thread_id
+    )
+    return _assistant_text(messages)
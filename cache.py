@@ -0,0 +1,269 @@
+import os
+import copy
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from storage import connect
+
+
+class TTLCache:
+    """
+    Cache mémoire avec expiration (TTL) et éviction LRU,
+    borné en nombre d'entrées et en octets.
+    Les valeurs sont stockées sérialisées en JSON : chaque lecture renvoie une copie.
+    """
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (expire_at, json encodé en UTF-8)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Retourne la valeur en cache, ou None si absente ou expirée.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expire_at, payload = entry
+            if expire_at < time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        size = len(payload)  # octets, pas caractères
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, payload)
+            self._bytes += size
+            # Éviction des entrées les moins récemment utilisées
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+class PersistentCache:
+    """
+    Cache sur disque (SQLite/WAL) partagé entre workers et conservé après un redémarrage.
+    Chaque entrée a sa propre durée de validité (ex : courte pour les erreurs).
+    """
+
+    PURGE_EVERY = 100  # écritures entre deux purges des entrées expirées
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expire_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """
+        Retourne la valeur en cache, ou None si absente ou expirée.
+        """
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expire_at > ?",
+            (self.namespace, key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expire_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), time.time() + ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expire_at <= ?",
+                (self.namespace, time.time())
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def stats(self, entries=True):
+        """
+        Compteurs du processus ; avec entries, compte aussi les entrées valides (requête sur la table).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            result = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None
+            }
+        if entries:
+            result["entries"] = self._connection().execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expire_at > ?",
+                (self.namespace, time.time())
+            ).fetchone()[0]
+        return result
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Regroupe les appels concurrents pour une même clé : le premier appelant
+    exécute la fonction, les suivants attendent son résultat. Chaque appelant,
+    premier compris, reçoit sa propre copie : le résultat partagé n'est jamais modifié.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.executed += 1
+            else:
+                self.collapsed += 1
+        
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        
+        try:
+            flight.result = fn(*args)
+            return copy.deepcopy(flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "executed": self.executed,
+                "collapsed": self.collapsed
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Équivalent asyncio de SingleFlight pour les coroutines d'une même boucle.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key, fn, *args):
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.collapsed += 1
+            return copy.deepcopy(await asyncio.shield(flight))
+
+        flight = asyncio.ensure_future(fn(*args))
+        self._flights[key] = flight
+        self.executed += 1
+        try:
+            return copy.deepcopy(await asyncio.shield(flight))
+        finally:
+            if flight.done():
+                self._release(key, flight)
+            else:
+                # Appelant annulé : le chargement continue pour les autres
+                flight.add_done_callback(lambda f: self._release(key, f))
+
+    def _release(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "executed": self.executed,
+            "collapsed": self.collapsed
+        }
@@ -0,0 +1,142 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limit import limiter, parse_retry_after
+
+# Configuration des pools de connexions et des retries vers les services Ngrok
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # nombre d'hôtes gardés en pool
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))  # connexions keep-alive par hôte
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+# Équivalents httpx pour le client asynchrone (mode ASGI)
+ASYNC_RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadError,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+
+logger = logging.getLogger(__name__)
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Retourne la session HTTP partagée du processus (recréée après un fork de gunicorn).
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=0  # retries gérés dans post_json
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = os.getpid()
+    return _session
+
+
+def backoff_delay(attempt):
+    """
+    Délai avant le retry numéro attempt : exponentiel plafonné, avec jitter complet.
+    """
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def post_json(url, payload, read_timeout=None, bucket=None):
+    """
+    POST JSON via la session partagée, avec retries sur erreurs 5xx et connexions coupées.
+    Si bucket est fourni, chaque tentative consomme un jeton du limiteur de débit
+    et un 429 ralentit le service au lieu d'échouer.
+    Retourne la dernière réponse obtenue (l'appelant vérifie le statut).
+    """
+    timeout = (HTTP_CONNECT_TIMEOUT, read_timeout or HTTP_READ_TIMEOUT)
+    attempt = 0
+    while True:
+        try:
+            if bucket:
+                limiter.acquire(bucket)
+            response = get_session().post(url, json=payload, timeout=timeout)
+            if response.status_code == 429 and bucket and attempt < HTTP_MAX_RETRIES:
+                limiter.penalize(bucket, parse_retry_after(response.headers))
+                attempt += 1
+                continue
+            if response.status_code < 500 or attempt >= HTTP_MAX_RETRIES:
+                return response
+            logger.warning("HTTP %s from %s, retry %s/%s", response.status_code, url, attempt + 1, HTTP_MAX_RETRIES)
+        except RETRYABLE_ERRORS as e:
+            if attempt >= HTTP_MAX_RETRIES:
+                raise
+            logger.warning("Connection error on %s: %s, retry %s/%s", url, e, attempt + 1, HTTP_MAX_RETRIES)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+_async_client = None
+_async_client_loop = None
+
+
+def get_async_client():
+    """
+    Retourne le client httpx asynchrone de la boucle d'événements courante.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE
+            )
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def post_json_async(url, payload, read_timeout=None, bucket=None):
+    """
+    Variante asyncio de post_json (mêmes retries, même limiteur de débit).
+    """
+    timeout = httpx.Timeout(read_timeout or HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    attempt = 0
+    while True:
+        try:
+            if bucket:
+                await limiter.acquire_async(bucket)
+            response = await get_async_client().post(url, json=payload, timeout=timeout)
+            if response.status_code == 429 and bucket and attempt < HTTP_MAX_RETRIES:
+                await asyncio.to_thread(limiter.penalize, bucket, parse_retry_after(response.headers))
+                attempt += 1
+                continue
+            if response.status_code < 500 or attempt >= HTTP_MAX_RETRIES:
+                return response
+            logger.warning("HTTP %s from %s, retry %s/%s", response.status_code, url, attempt + 1, HTTP_MAX_RETRIES)
+        except ASYNC_RETRYABLE_ERRORS as e:
+            if attempt >= HTTP_MAX_RETRIES:
+                raise
+            logger.warning("Connection error on %s: %s, retry %s/%s", url, e, attempt + 1, HTTP_MAX_RETRIES)
+        await asyncio.sleep(backoff_delay(attempt))
+        attempt += 1
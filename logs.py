@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Journalisation non bloquante : un appel de log dépose l'enregistrement dans une file,
+# un thread dédié le met en forme et l'écrit sur stdout
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Niveaux par module, ex : "assistant_runner=WARNING,webhooks=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json (une ligne JSON par message) ou text
+LOG_MAX_VALUE_CHARS = int(os.getenv("LOG_MAX_VALUE_CHARS", "500"))  # troncature des payloads (0 = aucune)
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# Part conservée des messages échantillonnés (extra={"sample": clé}), ex : "run_status=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "run_status=0.1")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # au-delà, les messages sont abandonnés
+
+# Bibliothèques bavardes au niveau INFO (une ligne par requête HTTP)
+QUIET_LOGGERS = {"httpx": "WARNING", "httpcore": "WARNING", "openai": "WARNING", "urllib3": "WARNING"}
+
+# Attributs standard d'un LogRecord (le reste vient de extra=... et est ajouté au JSON)
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample"}
+
+
+def parse_pairs(value, convert):
+    """
+    Lit une liste "nom=valeur,nom=valeur" en dict.
+    """
+    pairs = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, setting = item.split("=", 1)
+            pairs[name.strip()] = convert(setting.strip())
+    return pairs
+
+
+def truncate(value, max_chars=None):
+    """
+    Texte d'une valeur journalisée (JSON pour les dicts et listes), tronqué à max_chars.
+    """
+    max_chars = LOG_MAX_VALUE_CHARS if max_chars is None else max_chars
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if max_chars and len(text) > max_chars:
+        return f"{text[:max_chars]}… ({len(text)} chars)"
+    return text
+
+
+class Payload:
+    """
+    Valeur volumineuse passée en argument d'un message : sérialisée et tronquée
+    par le thread d'écriture, et seulement si le message passe le niveau.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return truncate(self.value)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne conserve qu'une part des messages marqués extra={"sample": clé}.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        return key is None or random.random() < self.rates.get(key, 1.0)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Dépose les messages dans la file sans jamais bloquer l'appelant :
+    si la file est pleine, le message est abandonné et compté.
+    La mise en forme est laissée au thread d'écriture.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Seule la trace d'exception est mise en texte ici (elle référence la pile courante)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Une ligne JSON par message : date, niveau, module, message et champs extra.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS)
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value if isinstance(value, (int, float, bool, type(None))) else truncate(value)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        record.message = truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS)
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {record.message}"
+        if record.exc_text:
+            line += f"\n{record.exc_text}"
+        return line
+
+
+_handler = None
+_listener = None
+
+
+def setup_logging():
+    """
+    Installe le handler non bloquant sur le logger racine et démarre le thread d'écriture
+    (une fois par processus).
+    """
+    global _handler, _listener
+    if _listener is not None:
+        return
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(parse_pairs(LOG_SAMPLE_RATES, float)))
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in {**QUIET_LOGGERS, **parse_pairs(LOG_LEVELS, str.upper)}.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(_listener.stop)  # vide la file à l'arrêt du processus
+
+
+def logging_stats():
+    return {
+        "dropped": _handler.dropped if _handler else 0,
+        "queued": _handler.queue.qsize() if _handler else 0
+    }
@@ -4,4 +4,9 @@ from app import app
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
+    if os.getenv("SERVER_MODE", "wsgi").lower() == "asgi":
+        # Mode asyncio (voir asgi_app.py)
+        import uvicorn
+        uvicorn.run("asgi_app:app", host='0.0.0.0', port=port)
+    else:
+        app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import re
+import math
+import unicodedata
+
+# Estimation du nombre de tokens sans tokenizer : ~4 caractères par token (texte français + markdown)
+CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+# Deux recherches/questions sont considérées identiques au-delà de cette similarité (Jaccard sur les mots)
+PROMPT_SIMILARITY_THRESHOLD = float(os.getenv("PROMPT_SIMILARITY_THRESHOLD", "0.8"))
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_text(text, max_chars):
+    """
+    Compacte les espaces et tronque au dernier mot entier avant max_chars (0 = pas de limite).
+    """
+    text = " ".join(str(text).split())
+    if not max_chars or len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0] or text[:max_chars]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def _words(text):
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return frozenset(re.findall(r"\w+", text))
+
+
+def dedupe_similar(items, threshold=None):
+    """
+    Retire les éléments quasi identiques (mêmes mots à la casse, aux accents, à la ponctuation
+    et à l'ordre près, ou similarité supérieure au seuil). Le premier est conservé.
+    """
+    threshold = PROMPT_SIMILARITY_THRESHOLD if threshold is None else threshold
+    kept = []
+    seen = []
+    for item in items:
+        words = _words(item)
+        if not words:
+            continue
+        if any(len(words & other) / len(words | other) >= threshold for other in seen):
+            continue
+        kept.append(item)
+        seen.append(words)
+    return kept
+
+
+def fit_to_budget(render, levels, budget):
+    """
+    Rend le texte avec les options de chaque niveau de compaction, dans l'ordre,
+    jusqu'à tenir dans budget tokens (0 = pas de limite). Si même le dernier niveau
+    dépasse, il est coupé ligne à ligne par la fin.
+    Retourne (texte, nombre de tokens estimé, niveau utilisé).
+    """
+    for level, options in enumerate(levels):
+        text = render(options)
+        tokens = estimate_tokens(text)
+        if budget <= 0 or tokens <= budget:
+            return text, tokens, level
+
+    lines = text.split("\n")
+    size = len(text)
+    while len(lines) > 1 and math.ceil(size / CHARS_PER_TOKEN) > budget:
+        size -= len(lines.pop()) + 1
+    text = "\n".join(lines)
+    return text, estimate_tokens(text), len(levels)
@@ -0,0 +1,282 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import httpx
+from storage import connect, shared_store_path
+
+# Budgets par service : requêtes par seconde (0 = illimité) et rafale maximale
+RATE_LIMITS = {
+    "openai": (float(os.getenv("OPENAI_RATE_LIMIT", "5")), float(os.getenv("OPENAI_RATE_BURST", "10"))),
+    "serp": (float(os.getenv("SERP_RATE_LIMIT", "0.5")), float(os.getenv("SERP_RATE_BURST", "2"))),
+    "keyword": (float(os.getenv("KEYWORD_RATE_LIMIT", "1")), float(os.getenv("KEYWORD_RATE_BURST", "3"))),
+}
+RATE_LIMIT_RECOVERY = float(os.getenv("RATE_LIMIT_RECOVERY", "60"))  # secondes pour doubler le débit après un 429
+RATE_LIMIT_MIN_FACTOR = 0.05  # débit minimal après ralentissements successifs
+RATE_LIMIT_MAX_WAIT = 1.0  # attente maximale entre deux tentatives d'acquisition
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket par service, partagé entre threads et, via la base SQLite
+    du store, entre workers gunicorn. Un 429 divise le débit par deux ;
+    il remonte ensuite progressivement (doublé toutes les RATE_LIMIT_RECOVERY secondes).
+    resolve_path retourne le chemin de la base (ou None pour un état en mémoire) ;
+    il est appelé au premier usage, pas à l'import.
+    """
+
+    def __init__(self, limits, resolve_path):
+        self.limits = limits
+        self._resolve_path = resolve_path
+        self._path = None
+        self._resolved = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._buckets = {}  # état en mémoire si pas de base partagée
+        self._counters = {name: {"acquired": 0, "waited": 0, "throttled": 0} for name in limits}
+
+    @property
+    def path(self):
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    path = self._resolve_path()
+                    if path:
+                        connect(path).execute("""
+                            CREATE TABLE IF NOT EXISTS rate_limits (
+                                name TEXT PRIMARY KEY,
+                                tokens REAL NOT NULL,
+                                updated_at REAL NOT NULL,
+                                factor REAL NOT NULL,
+                                penalized_at REAL NOT NULL
+                            )
+                        """)
+                    self._path = path
+                    self._resolved = True
+        return self._path
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _update(self, name, fn):
+        """
+        Applique fn(état) -> (nouvel état, résultat) de façon atomique.
+        """
+        now = time.time()
+        rate, burst = self.limits[name]
+        initial = {"tokens": burst, "updated_at": now, "factor": 1.0, "penalized_at": 0.0}
+        if not self.path:
+            with self._lock:
+                state, result = fn(dict(self._buckets.get(name, initial)), now)
+                self._buckets[name] = state
+                return result
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, factor, penalized_at FROM rate_limits WHERE name = ?",
+                (name,)
+            ).fetchone()
+            if row:
+                initial = {"tokens": row[0], "updated_at": row[1], "factor": row[2], "penalized_at": row[3]}
+            state, result = fn(initial, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at, factor, penalized_at) VALUES (?, ?, ?, ?, ?)",
+                (name, state["tokens"], state["updated_at"], state["factor"], state["penalized_at"])
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _effective_rate(self, name, state, now):
+        rate, _ = self.limits[name]
+        factor = state["factor"]
+        if factor < 1.0:
+            # Un facteur minimal revient à 1 en log2(1 / RATE_LIMIT_MIN_FACTOR) périodes
+            recovered = min(now - state["penalized_at"], 10 * RATE_LIMIT_RECOVERY)
+            factor = min(1.0, factor * 2 ** (recovered / RATE_LIMIT_RECOVERY))
+        return rate * factor, factor
+
+    def _refill(self, name, state, now):
+        rate, _ = self._effective_rate(name, state, now)
+        _, burst = self.limits[name]
+        state["tokens"] = min(burst, state["tokens"] + (now - state["updated_at"]) * rate)
+        state["updated_at"] = now
+        return rate
+
+    def _limited(self, name):
+        return name in self.limits and self.limits[name][0] > 0
+
+    def _try_acquire(self, name):
+        """
+        Consomme un jeton si possible. Retourne 0, ou le délai (secondes) avant le prochain jeton.
+        """
+        def take(state, now):
+            rate = self._refill(name, state, now)
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return state, 0
+            return state, (1 - state["tokens"]) / rate
+
+        return self._update(name, take)
+
+    def _record(self, name, waited):
+        with self._lock:
+            self._counters[name]["acquired"] += 1
+            if waited:
+                self._counters[name]["waited"] += 1
+
+    def acquire(self, name):
+        """
+        Bloque jusqu'à ce qu'un jeton soit disponible pour le service name.
+        """
+        if not self._limited(name):
+            return
+        waited = False
+        while True:
+            wait = self._try_acquire(name)
+            if wait <= 0:
+                break
+            waited = True
+            time.sleep(min(wait, RATE_LIMIT_MAX_WAIT))
+        self._record(name, waited)
+
+    async def acquire_async(self, name):
+        """
+        Variante asyncio de acquire : l'attente ne bloque pas la boucle d'événements,
+        et la transaction SQLite du bucket partagé s'exécute dans un thread.
+        """
+        if not self._limited(name):
+            return
+        waited = False
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, name) if self.path else self._try_acquire(name)
+            if wait <= 0:
+                break
+            waited = True
+            await asyncio.sleep(min(wait, RATE_LIMIT_MAX_WAIT))
+        self._record(name, waited)
+
+    def penalize(self, name, retry_after=None):
+        """
+        Signale un 429 : divise le débit par deux et, si retry_after est connu,
+        bloque les acquisitions pendant ce délai.
+        """
+        if not self._limited(name):
+            return
+
+        def slow_down(state, now):
+            self._refill(name, state, now)
+            _, factor = self._effective_rate(name, state, now)
+            state["factor"] = max(RATE_LIMIT_MIN_FACTOR, factor / 2)
+            state["penalized_at"] = now
+            rate, _ = self.limits[name]
+            # Dette de jetons : aucune acquisition avant retry_after secondes
+            debt = (retry_after or 0) * rate * state["factor"]
+            state["tokens"] = min(state["tokens"], 0) - debt
+            return state, None
+
+        self._update(name, slow_down)
+        with self._lock:
+            self._counters[name]["throttled"] += 1
+        logger.warning("Rate limited by %s, slowing down (retry_after=%s)", name, retry_after)
+
+    def _read(self, name):
+        """
+        Retourne l'état courant du bucket sans le modifier (lecture seule, pas de verrou d'écriture).
+        """
+        _, burst = self.limits[name]
+        initial = {"tokens": burst, "updated_at": time.time(), "factor": 1.0, "penalized_at": 0.0}
+        if not self.path:
+            with self._lock:
+                return dict(self._buckets.get(name, initial))
+        row = self._connection().execute(
+            "SELECT tokens, updated_at, factor, penalized_at FROM rate_limits WHERE name = ?",
+            (name,)
+        ).fetchone()
+        if row is None:
+            return initial
+        return {"tokens": row[0], "updated_at": row[1], "factor": row[2], "penalized_at": row[3]}
+
+    def stats(self):
+        result = {}
+        for name, (rate, burst) in self.limits.items():
+            state = self._read(name)
+            effective_rate, _ = self._effective_rate(name, state, time.time())
+            with self._lock:
+                result[name] = {
+                    "rate": rate,
+                    "effective_rate": round(effective_rate, 3),
+                    "burst": burst,
+                    **self._counters[name]
+                }
+        return result
+
+
+def parse_retry_after(headers):
+    """
+    Retourne le délai Retry-After (en secondes) d'une réponse 429, ou None.
+    """
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedTransport(httpx.HTTPTransport):
+    """
+    Transport httpx qui consomme un jeton avant chaque requête et
+    transforme les 429 en ralentissement puis nouvel essai.
+    """
+
+    def __init__(self, bucket, max_retries=3, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.max_retries = max_retries
+
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            limiter.acquire(self.bucket)
+            response = super().handle_request(request)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            response.close()
+            limiter.penalize(self.bucket, parse_retry_after(response.headers))
+            attempt += 1
+
+
+class AsyncRateLimitedTransport(httpx.AsyncHTTPTransport):
+    """
+    Équivalent asyncio de RateLimitedTransport (client AsyncOpenAI du mode ASGI).
+    """
+
+    def __init__(self, bucket, max_retries=3, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request):
+        attempt = 0
+        while True:
+            await limiter.acquire_async(self.bucket)
+            response = await super().handle_async_request(request)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            await response.aclose()
+            await asyncio.to_thread(limiter.penalize, self.bucket, parse_retry_after(response.headers))
+            attempt += 1
+
+
+# Limiteur partagé du processus : même backend que le store (état commun à tous les workers
+# en SQLite, propre au processus en mode "memory")
+limiter = RateLimiter(RATE_LIMITS, shared_store_path)
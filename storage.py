@@ -0,0 +1,728 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+
+# Corps des briefs et articles (champ "body" d'une file) stockés compressés en zlib,
+# décompressés seulement à la lecture d'une entrée complète
+BODY_COMPRESS_LEVEL = int(os.getenv("BODY_COMPRESS_LEVEL", "6"))
+
+
+def compress_body(text):
+    return zlib.compress(text.encode("utf-8"), BODY_COMPRESS_LEVEL)
+
+
+def decompress_body(blob):
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def split_body(value, field):
+    """
+    Sépare le corps (chaîne du champ field) du reste de l'entrée.
+    Retourne (entrée sans le corps, corps compressé ou None).
+    """
+    if field is None or not isinstance(value, dict) or not isinstance(value.get(field), str):
+        return value, None
+    metadata = {key: item for key, item in value.items() if key != field}
+    return metadata, compress_body(value[field])
+
+
+def connect(path):
+    """
+    Ouvre une connexion SQLite en mode WAL (lecteurs et écrivains concurrents entre processus).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=30,
+        isolation_level=None,  # autocommit, transactions explicites
+        check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # écritures peu coûteuses, durable au checkpoint
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class MemoryQueue(MutableMapping):
+    """
+    File d'attente en mémoire (un dict protégé par un verrou).
+    Utile en développement ou pour un seul worker.
+    """
+
+    def __init__(self, name, lock, index=None, normalize=None, body=None):
+        self.name = name
+        self._lock = lock
+        self._data = {}
+        self._body_field = body
+        self._bodies = {}  # job_id -> corps compressé
+        self._index_field = index
+        self._normalize = normalize or (lambda v: v)
+        self._index = {}  # clé normalisée -> {job_id: None}, dans l'ordre d'insertion
+        self._seq = {}  # job_id -> numéro d'insertion (curseur de pagination)
+        self._next_seq = 0
+        self._sizes = {}  # job_id -> taille JSON (octets)
+        self._bytes = 0
+        self._stored_at = {}  # job_id -> date d'insertion
+        self._accessed_at = {}  # job_id -> dernière écriture ou lecture signalée par touch
+
+    def _index_key(self, value):
+        if self._index_field is None or not isinstance(value, dict):
+            return None
+        field = value.get(self._index_field)
+        return self._normalize(field) if field is not None else None
+
+    def _unindex(self, job_id):
+        key = self._index_key(self._data.get(job_id))
+        if key is not None:
+            ids = self._index.get(key)
+            if ids is not None:
+                ids.pop(job_id, None)
+                if not ids:
+                    del self._index[key]
+
+    def _load(self, job_id):
+        value = self._data[job_id]
+        blob = self._bodies.get(job_id)
+        if blob is None:
+            return value
+        return {**value, self._body_field: decompress_body(blob)}
+
+    def __getitem__(self, job_id):
+        with self._lock:
+            return self._load(job_id)
+
+    def metadata(self, job_id):
+        """
+        Retourne l'entrée sans son corps (pas de décompression).
+        """
+        with self._lock:
+            return self._data[job_id]
+
+    def __setitem__(self, job_id, value):
+        value, blob = split_body(value, self._body_field)
+        size = len(json.dumps(value).encode("utf-8")) + len(blob or b"")
+        with self._lock:
+            self._unindex(job_id)
+            now = time.time()
+            if job_id not in self._data:
+                self._next_seq += 1
+                self._seq[job_id] = self._next_seq
+                self._stored_at[job_id] = now
+            self._bytes += size - self._sizes.get(job_id, 0)
+            self._sizes[job_id] = size
+            self._accessed_at[job_id] = now
+            self._data[job_id] = value
+            if blob is None:
+                self._bodies.pop(job_id, None)
+            else:
+                self._bodies[job_id] = blob
+            key = self._index_key(value)
+            if key is not None:
+                self._index.setdefault(key, {})[job_id] = None
+
+    def __delitem__(self, job_id):
+        with self._lock:
+            self._unindex(job_id)
+            del self._data[job_id]
+            del self._seq[job_id]
+            self._bodies.pop(job_id, None)
+            self._bytes -= self._sizes.pop(job_id)
+            del self._stored_at[job_id]
+            del self._accessed_at[job_id]
+
+    def __contains__(self, job_id):
+        with self._lock:
+            return job_id in self._data
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def items(self, body=True):
+        with self._lock:
+            if not body:
+                return list(self._data.items())
+            return [(job_id, self._load(job_id)) for job_id in self._data]
+
+    def values(self, body=True):
+        return [value for _, value in self.items(body)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bodies.clear()
+            self._index.clear()
+            self._seq.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self._stored_at.clear()
+            self._accessed_at.clear()
+
+    def size_bytes(self):
+        with self._lock:
+            return self._bytes
+
+    def touch(self, job_id):
+        """
+        Signale une lecture de l'entrée (ordre d'éviction LRU).
+        """
+        with self._lock:
+            if job_id in self._data:
+                self._accessed_at[job_id] = time.time()
+
+    def expire(self, max_age, prefix=None):
+        """
+        Supprime les entrées insérées il y a plus de max_age secondes
+        (seulement celles dont l'identifiant commence par prefix s'il est donné).
+        Retourne le nombre d'entrées supprimées.
+        """
+        limit = time.time() - max_age
+        with self._lock:
+            expired = [job_id for job_id, stored_at in self._stored_at.items()
+                       if stored_at < limit and (prefix is None or job_id.startswith(prefix))]
+            for job_id in expired:
+                del self[job_id]
+            return len(expired)
+
+    def evict(self, max_entries=0, max_bytes=0, lru=False):
+        """
+        Supprime les entrées les plus anciennes (ou les moins récemment lues si lru)
+        jusqu'à respecter max_entries et max_bytes (0 = pas de limite).
+        Retourne le nombre d'entrées supprimées.
+        """
+        with self._lock:
+            order = self._accessed_at if lru else self._seq
+            evicted = 0
+            for job_id in sorted(self._data, key=order.get):
+                over_entries = max_entries and len(self._data) > max_entries
+                over_bytes = max_bytes and self._bytes > max_bytes
+                if not over_entries and not over_bytes:
+                    break
+                del self[job_id]
+                evicted += 1
+            return evicted
+
+    def page(self, after=None, limit=50, since=None, time_field=None, fields=()):
+        """
+        Retourne une page d'entrées ([(job_id, {champ: valeur})], curseur suivant ou None),
+        dans l'ordre d'insertion, après le curseur after et, si since est donné,
+        avec time_field >= since. Seuls les champs demandés sont lus.
+        """
+        rows = []
+        last = None
+        with self._lock:
+            for job_id, value in self._data.items():
+                seq = self._seq[job_id]
+                if after is not None and seq <= after:
+                    continue
+                if since is not None and (value.get(time_field) or 0) < since:
+                    continue
+                rows.append((job_id, {field: value.get(field) for field in fields}))
+                last = seq
+                if len(rows) >= limit:
+                    break
+        return rows, (last if len(rows) >= limit else None)
+
+    def add(self, job_id, value):
+        """
+        Insère l'entrée uniquement si job_id est libre. Retourne True si insérée.
+        """
+        with self._lock:
+            if job_id in self._data:
+                return False
+            self[job_id] = value
+            return True
+
+    def find_all(self, value, newest=False, limit=None, body=True):
+        """
+        Retourne les entrées (job_id, data) dont le champ indexé correspond à value,
+        de la plus ancienne à la plus récente (ou l'inverse avec newest=True).
+        Avec body=False, les entrées sont retournées sans leur corps.
+        """
+        with self._lock:
+            ids = list(self._index.get(self._normalize(value), ()))
+            if newest:
+                ids.reverse()
+            if limit is not None:
+                ids = ids[:limit]
+            return [(job_id, self._load(job_id) if body else self._data[job_id]) for job_id in ids]
+
+    def find(self, value, newest=False, body=True):
+        """
+        Retourne la première entrée (job_id, data) correspondant à value, ou None.
+        """
+        matches = self.find_all(value, newest=newest, limit=1, body=body)
+        return matches[0] if matches else None
+
+    def first(self, body=True):
+        """
+        Retourne la plus ancienne entrée (job_id, data) ou None.
+        """
+        with self._lock:
+            for job_id in self._data:
+                return job_id, self._load(job_id) if body else self._data[job_id]
+            return None
+
+
+class MemoryStore:
+    """
+    Backend mémoire : chaque processus a ses propres files.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._queues = {}
+
+    def queue(self, name, index=None, normalize=None, body=None):
+        with self._lock:
+            if name not in self._queues:
+                self._queues[name] = MemoryQueue(name, self._lock, index, normalize, body)
+            return self._queues[name]
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield
+
+
+class SQLiteQueue(MutableMapping):
+    """
+    File d'attente persistée dans une table SQLite partagée.
+    Les valeurs sont des dicts sérialisés en JSON, l'ordre d'insertion est conservé.
+    """
+
+    def __init__(self, name, store, index=None, normalize=None, body=None):
+        self.name = name
+        self._store = store
+        self._body_field = body
+        self._index_field = index
+        self._normalize = normalize or (lambda v: v)
+        if index is not None:
+            self._backfill_index()
+        if body is not None:
+            self._compress_bodies()
+
+    def _execute(self, sql, params=()):
+        return self._store.connection().execute(sql, params)
+
+    def _index_key(self, value):
+        if self._index_field is None or not isinstance(value, dict):
+            return None
+        field = value.get(self._index_field)
+        return self._normalize(field) if field is not None else None
+
+    def _backfill_index(self):
+        # Lignes écrites avant l'ajout de la colonne lookup
+        rows = self._execute(
+            "SELECT job_id, data FROM jobs WHERE queue = ? AND lookup IS NULL",
+            (self.name,)
+        ).fetchall()
+        for job_id, data in rows:
+            key = self._index_key(json.loads(data))
+            if key is not None:
+                self._execute(
+                    "UPDATE jobs SET lookup = ? WHERE queue = ? AND job_id = ?",
+                    (key, self.name, job_id)
+                )
+
+    def _load(self, data, blob=None):
+        value = json.loads(data)
+        if blob is not None:
+            value[self._body_field] = decompress_body(blob)
+        return value
+
+    def _columns(self, body):
+        # Le corps (colonne body) n'est lu que si l'appelant en a besoin
+        return "data, body" if body else "data"
+
+    def _compress_bodies(self):
+        # Lignes écrites avant la compression : corps encore dans le JSON
+        rows = self._execute(
+            "SELECT job_id, data FROM jobs WHERE queue = ? AND body IS NULL AND json_extract(data, ?) IS NOT NULL",
+            (self.name, f"$.{self._body_field}")
+        ).fetchall()
+        for job_id, data in rows:
+            metadata, blob = split_body(json.loads(data), self._body_field)
+            if blob is not None:
+                self._execute(
+                    "UPDATE jobs SET data = ?, body = ? WHERE queue = ? AND job_id = ?",
+                    (json.dumps(metadata), blob, self.name, job_id)
+                )
+
+    def __getitem__(self, job_id):
+        row = self._execute(
+            "SELECT data, body FROM jobs WHERE queue = ? AND job_id = ?",
+            (self.name, job_id)
+        ).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return self._load(*row)
+
+    def metadata(self, job_id):
+        """
+        Retourne l'entrée sans son corps (ni lecture ni décompression du corps).
+        """
+        row = self._execute(
+            "SELECT data FROM jobs WHERE queue = ? AND job_id = ?",
+            (self.name, job_id)
+        ).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, job_id, value):
+        now = time.time()
+        metadata, blob = split_body(value, self._body_field)
+        self._execute(
+            "INSERT INTO jobs (queue, job_id, data, body, lookup, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(queue, job_id) DO UPDATE SET data = excluded.data, body = excluded.body, "
+            "lookup = excluded.lookup, accessed_at = excluded.accessed_at",
+            (self.name, job_id, json.dumps(metadata), blob, self._index_key(value), now, now)
+        )
+
+    def __delitem__(self, job_id):
+        cursor = self._execute(
+            "DELETE FROM jobs WHERE queue = ? AND job_id = ?",
+            (self.name, job_id)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(job_id)
+
+    def __contains__(self, job_id):
+        row = self._execute(
+            "SELECT 1 FROM jobs WHERE queue = ? AND job_id = ?",
+            (self.name, job_id)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        rows = self._execute(
+            "SELECT job_id FROM jobs WHERE queue = ? ORDER BY seq",
+            (self.name,)
+        ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self):
+        # Compteur tenu à jour par des triggers (O(1), sans parcourir la file)
+        row = self._execute(
+            "SELECT count FROM queue_counts WHERE queue = ?",
+            (self.name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def items(self, body=True):
+        rows = self._execute(
+            f"SELECT job_id, {self._columns(body)} FROM jobs WHERE queue = ? ORDER BY seq",
+            (self.name,)
+        ).fetchall()
+        return [(row[0], self._load(*row[1:])) for row in rows]
+
+    def values(self, body=True):
+        return [value for _, value in self.items(body)]
+
+    def clear(self):
+        self._execute("DELETE FROM jobs WHERE queue = ?", (self.name,))
+
+    def size_bytes(self):
+        # Taille totale des données (JSON et corps compressés), tenue à jour par les mêmes triggers que le nombre d'entrées
+        row = self._execute(
+            "SELECT bytes FROM queue_counts WHERE queue = ?",
+            (self.name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def touch(self, job_id):
+        """
+        Signale une lecture de l'entrée (ordre d'éviction LRU).
+        """
+        self._execute(
+            "UPDATE jobs SET accessed_at = ? WHERE queue = ? AND job_id = ?",
+            (time.time(), self.name, job_id)
+        )
+
+    def expire(self, max_age, prefix=None):
+        """
+        Supprime les entrées insérées il y a plus de max_age secondes
+        (seulement celles dont l'identifiant commence par prefix s'il est donné).
+        Retourne le nombre d'entrées supprimées.
+        """
+        sql = "DELETE FROM jobs WHERE queue = ? AND stored_at < ?"
+        params = [self.name, time.time() - max_age]
+        if prefix is not None:
+            sql += " AND substr(job_id, 1, ?) = ?"
+            params += [len(prefix), prefix]
+        return self._execute(sql, params).rowcount
+
+    def evict(self, max_entries=0, max_bytes=0, lru=False):
+        """
+        Supprime les entrées les plus anciennes (ou les moins récemment lues si lru)
+        jusqu'à respecter max_entries et max_bytes (0 = pas de limite).
+        Retourne le nombre d'entrées supprimées.
+        """
+        order = "accessed_at, seq" if lru else "seq"
+        with self._store.transaction():
+            excess_entries = max(0, len(self) - max_entries) if max_entries else 0
+            excess_bytes = max(0, self.size_bytes() - max_bytes) if max_bytes else 0
+            if not excess_entries and not excess_bytes:
+                return 0
+            # Parcours dans l'ordre d'éviction sans lire les données (taille seulement)
+            rows = self._execute(
+                f"SELECT seq, {ENTRY_BYTES.format(row='jobs')} FROM jobs WHERE queue = ? ORDER BY {order}",
+                (self.name,)
+            )
+            evicted = []
+            for seq, size in rows:
+                if len(evicted) >= excess_entries and excess_bytes <= 0:
+                    break
+                evicted.append(seq)
+                excess_bytes -= size
+            rows.close()
+            for start in range(0, len(evicted), 500):
+                chunk = evicted[start:start + 500]
+                self._execute(f"DELETE FROM jobs WHERE seq IN ({','.join('?' * len(chunk))})", chunk)
+            return len(evicted)
+
+    def page(self, after=None, limit=50, since=None, time_field=None, fields=()):
+        """
+        Retourne une page d'entrées ([(job_id, {champ: valeur})], curseur suivant ou None),
+        dans l'ordre d'insertion, après le curseur after et, si since est donné,
+        avec time_field >= since. Seuls les champs demandés sont extraits du JSON.
+        """
+        columns = "".join(", json_extract(data, ?)" for _ in fields)
+        sql = f"SELECT seq, job_id{columns} FROM jobs WHERE queue = ? AND seq > ?"
+        params = [f"$.{field}" for field in fields] + [self.name, after or 0]
+        if since is not None:
+            sql += " AND json_extract(data, ?) >= ?"
+            params += [f"$.{time_field}", since]
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(int(limit))
+        rows = self._execute(sql, params).fetchall()
+        page = [(row[1], dict(zip(fields, row[2:]))) for row in rows]
+        return page, (rows[-1][0] if len(rows) >= limit else None)
+
+    def add(self, job_id, value):
+        """
+        Insère l'entrée uniquement si job_id est libre. Retourne True si insérée.
+        """
+        now = time.time()
+        metadata, blob = split_body(value, self._body_field)
+        cursor = self._execute(
+            "INSERT OR IGNORE INTO jobs (queue, job_id, data, body, lookup, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.name, job_id, json.dumps(metadata), blob, self._index_key(value), now, now)
+        )
+        return cursor.rowcount == 1
+
+    def find_all(self, value, newest=False, limit=None, body=True):
+        """
+        Retourne les entrées (job_id, data) dont le champ indexé correspond à value,
+        de la plus ancienne à la plus récente (ou l'inverse avec newest=True).
+        Avec body=False, les entrées sont retournées sans leur corps.
+        """
+        sql = f"SELECT job_id, {self._columns(body)} FROM jobs WHERE queue = ? AND lookup = ? ORDER BY seq"
+        if newest:
+            sql += " DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        rows = self._execute(sql, (self.name, self._normalize(value))).fetchall()
+        return [(row[0], self._load(*row[1:])) for row in rows]
+
+    def find(self, value, newest=False, body=True):
+        """
+        Retourne la première entrée (job_id, data) correspondant à value, ou None.
+        """
+        matches = self.find_all(value, newest=newest, limit=1, body=body)
+        return matches[0] if matches else None
+
+    def first(self, body=True):
+        """
+        Retourne la plus ancienne entrée (job_id, data) ou None.
+        """
+        row = self._execute(
+            f"SELECT job_id, {self._columns(body)} FROM jobs WHERE queue = ? ORDER BY seq LIMIT 1",
+            (self.name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], self._load(*row[1:])
+
+
+# Taille d'une ligne de jobs (JSON et corps compressé) et version des triggers qui la comptent
+ENTRY_BYTES = "length(CAST({row}.data AS BLOB)) + COALESCE(length({row}.body), 0)"
+COUNTS_VERSION = 2
+
+
+class SQLiteStore:
+    """
+    Backend SQLite en mode WAL, partagé entre les workers gunicorn.
+    Une connexion par thread et par processus (recréée après un fork).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._queues = {}
+        self._init_schema()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self.connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                lookup TEXT,
+                UNIQUE (queue, job_id)
+            )
+        """)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if not {"lookup", "stored_at", "accessed_at", "body"} <= set(columns):
+            self._migrate_columns(conn)
+        # Index secondaire : mot-clé normalisé (briefs) ou brief_id (contenus), trié par récence
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_lookup ON jobs (queue, lookup, seq)")
+        # Parcours d'une file dans l'ordre d'insertion (pagination, first)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (queue, seq)")
+        # Rétention : expiration par date d'insertion, éviction LRU par date de lecture
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_stored ON jobs (queue, stored_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_accessed ON jobs (queue, accessed_at, seq)")
+        self._init_counts(conn)
+
+    def _migrate_columns(self, conn):
+        # Colonnes ajoutées depuis la création de la base. Plusieurs workers peuvent démarrer
+        # en même temps : le schéma est relu sous verrou d'écriture avant chaque ALTER.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "lookup" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lookup TEXT")
+            if "stored_at" not in columns:
+                # Bases créées avant la rétention : dates reprises des champs completed_at / created_at
+                conn.execute("ALTER TABLE jobs ADD COLUMN stored_at REAL")
+                conn.execute("ALTER TABLE jobs ADD COLUMN accessed_at REAL")
+                conn.execute(
+                    "UPDATE jobs SET stored_at = COALESCE(json_extract(data, '$.completed_at'), json_extract(data, '$.created_at'), ?)",
+                    (time.time(),)
+                )
+                conn.execute("UPDATE jobs SET accessed_at = stored_at")
+            if "body" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN body BLOB")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _init_counts(self, conn):
+        # Nombre d'entrées et taille des données par file, maintenus par triggers
+        # dans la même transaction que l'écriture
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queue_counts'"
+            ).fetchone()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if not exists:
+                conn.execute("CREATE TABLE queue_counts (queue TEXT PRIMARY KEY, count INTEGER NOT NULL, bytes INTEGER NOT NULL DEFAULT 0)")
+                conn.execute(
+                    "INSERT INTO queue_counts (queue, count, bytes) "
+                    f"SELECT queue, COUNT(*), SUM({ENTRY_BYTES.format(row='jobs')}) FROM jobs GROUP BY queue"
+                )
+            elif version < COUNTS_VERSION:
+                # Triggers d'une version précédente : tailles recalculées, triggers remplacés ci-dessous
+                if "bytes" not in [row[1] for row in conn.execute("PRAGMA table_info(queue_counts)")]:
+                    conn.execute("ALTER TABLE queue_counts ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+                conn.execute(
+                    f"UPDATE queue_counts SET bytes = COALESCE((SELECT SUM({ENTRY_BYTES.format(row='jobs')}) "
+                    "FROM jobs WHERE jobs.queue = queue_counts.queue), 0)"
+                )
+                for trigger in ("jobs_count_insert", "jobs_count_delete", "jobs_bytes_update"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS jobs_count_insert AFTER INSERT ON jobs BEGIN
+                    INSERT INTO queue_counts (queue, count, bytes) VALUES (NEW.queue, 1, {ENTRY_BYTES.format(row='NEW')})
+                    ON CONFLICT(queue) DO UPDATE SET count = count + 1, bytes = bytes + excluded.bytes;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS jobs_count_delete AFTER DELETE ON jobs BEGIN
+                    UPDATE queue_counts SET count = count - 1, bytes = bytes - ({ENTRY_BYTES.format(row='OLD')})
+                    WHERE queue = OLD.queue;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS jobs_bytes_update AFTER UPDATE OF data, body ON jobs BEGIN
+                    UPDATE queue_counts SET bytes = bytes + ({ENTRY_BYTES.format(row='NEW')}) - ({ENTRY_BYTES.format(row='OLD')})
+                    WHERE queue = NEW.queue;
+                END
+            """)
+            conn.execute(f"PRAGMA user_version = {COUNTS_VERSION}")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def queue(self, name, index=None, normalize=None, body=None):
+        """
+        Retourne la file nommée. index désigne le champ indexé (optionnel),
+        normalize la fonction appliquée à sa valeur avant indexation et recherche,
+        body le champ texte stocké compressé (corps du brief ou de l'article).
+        """
+        if name not in self._queues:
+            self._queues[name] = SQLiteQueue(name, self, index, normalize, body)
+        return self._queues[name]
+
+    @contextmanager
+    def transaction(self):
+        """
+        Regroupe plusieurs écritures (ex : déplacer un job de pending vers completed).
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def shared_store_path():
+    """
+    Retourne le chemin de la base SQLite partagée entre workers, ou None en mode "memory".
+    """
+    backend = os.getenv("JOB_STORE_BACKEND", "sqlite").lower()
+    if backend == "memory":
+        return None
+    if backend == "sqlite":
+        return os.getenv("JOB_STORE_PATH", "jobs.db")
+    raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend}")
+
+
+def create_store():
+    """
+    Crée le backend de stockage selon JOB_STORE_BACKEND ("sqlite" par défaut, ou "memory").
+    """
+    path = shared_store_path()
+    if path is None:
+        return MemoryStore()
+    return SQLiteStore(path)
@@ -0,0 +1,83 @@
+import os
+import copy
+import json
+from prompt_budget import truncate_text
+
+# Taille maximale (caractères JSON) d'un résultat de fonction renvoyé à l'assistant
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "12000"))
+TOOL_OUTPUT_DESCRIPTION_CHARS = int(os.getenv("TOOL_OUTPUT_DESCRIPTION_CHARS", "300"))
+
+# Champs conservés par fonction : True = valeur telle quelle, entier = chaîne tronquée à N caractères,
+# dict = sous-champs (appliqué à chaque élément d'une liste). Les autres champs sont retirés.
+TOOL_OUTPUT_SCHEMAS = {
+    "getSERPResults": {
+        "query": True,
+        "organic_results": {
+            "position": True,
+            "page_title": True,
+            "url": True,
+            "domain": True,
+            "meta_description": TOOL_OUTPUT_DESCRIPTION_CHARS,
+            "word_count": True,
+            "media": {"images": True, "videos": True},
+            "structured_data_info": True,
+        },
+        "related_searches": True,
+        "related_questions": {"question": True},
+        "error": True,
+    },
+    "getKeywordData": {
+        "mot_cle_principal": True,
+        "volume_principal": True,
+        "concurrence": True,
+        "saisonnalite": True,
+        "suggestions": True,
+        "error": True,
+    },
+}
+
+
+def project(value, schema):
+    """
+    Retourne une copie de value réduite aux champs décrits par schema
+    (nouveaux dicts et listes : value n'est jamais modifiée).
+    """
+    if schema is True:
+        return copy.deepcopy(value)
+    if isinstance(schema, int):
+        return truncate_text(value, schema) if isinstance(value, str) else value
+    if isinstance(value, list):
+        return [project(item, schema) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], sub) for key, sub in schema.items() if key in value}
+    return value
+
+
+def cap_size(output, max_chars):
+    """
+    Retire les derniers éléments de la plus grosse liste jusqu'à ce que le JSON
+    tienne dans max_chars, et marque alors le résultat "truncated".
+    Retourne un nouveau dict (listes raccourcies copiées) : output n'est pas modifié.
+    """
+    if len(json.dumps(output)) <= max_chars:
+        return output
+    output = dict(output)
+    while len(json.dumps(output)) > max_chars:
+        names = [name for name, value in output.items() if isinstance(value, list) and value]
+        if not names:
+            break
+        name = max(names, key=lambda name: len(json.dumps(output[name])))
+        output[name] = output[name][:-1]
+    output["truncated"] = True
+    return output
+
+
+def project_tool_output(function_name, result):
+    """
+    Réduit le résultat d'un appel de fonction aux champs utiles à l'assistant,
+    dans la limite de TOOL_OUTPUT_MAX_CHARS. Les fonctions sans schéma sont inchangées.
+    """
+    schema = TOOL_OUTPUT_SCHEMAS.get(function_name)
+    if schema is None or not isinstance(result, dict):
+        return result
+    return cap_size(project(result, schema), TOOL_OUTPUT_MAX_CHARS)
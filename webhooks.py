@@ -0,0 +1,235 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import socket
+import hashlib
+import ipaddress
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from http_client import get_session, HTTP_CONNECT_TIMEOUT
+
+# Notifications de fin de job envoyées aux callback_url fournies par Make
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))  # secondes par envoi
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_DELAY = float(os.getenv("WEBHOOK_RETRY_DELAY", "30"))  # doublé à chaque échec
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv("WEBHOOK_RETRY_MAX_DELAY", "3600"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "5"))  # relecture de la file (retries, autres workers)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # signature HMAC-SHA256 du corps si défini
+WEBHOOK_FAILED_TTL = int(os.getenv("WEBHOOK_FAILED_TTL", "604800"))  # envois en échec conservés (secondes, 0 = sans limite)
+# Autoriser les callback_url vers des adresses locales ou privées (développement uniquement)
+WEBHOOK_ALLOW_PRIVATE = os.getenv("WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"
+WEBHOOK_CLAIM_TIMEOUT = 3 * WEBHOOK_TIMEOUT  # un envoi interrompu (worker arrêté) est repris après ce délai
+logger = logging.getLogger(__name__)
+
+
+def public_host(url):
+    """
+    Vrai si toutes les adresses de l'hôte de url sont publiques (ni loopback, ni privées,
+    ni link-local, ni réservées) : pas d'envoi vers le réseau interne du serveur.
+    Lève OSError si l'hôte ne se résout pas.
+    """
+    parsed = urlparse(url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except (ValueError, UnicodeError) as e:
+        raise OSError(str(e))
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0].split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            return False
+    return bool(addresses)
+
+
+def callback_url_error(url):
+    """
+    Motif du refus d'une callback_url (message d'erreur), ou None si elle est acceptée.
+    """
+    parsed = urlparse(url) if isinstance(url, str) else None
+    if parsed is None or parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "callback_url must be an http(s) URL"
+    if WEBHOOK_ALLOW_PRIVATE:
+        return None
+    try:
+        if not public_host(url):
+            return "callback_url host is not a public address"
+    except OSError:
+        return "callback_url host does not resolve"
+    return None
+
+
+class WebhookDispatcher:
+    """
+    Envoie les notifications de fin de job. Chaque envoi est d'abord enregistré
+    dans une file du store, dans la même transaction que la fin du job, puis livré
+    par un thread de fond. Un envoi réussi est retiré de la file. Un échec est retenté
+    avec un délai doublé à chaque fois ; après WEBHOOK_MAX_ATTEMPTS tentatives l'envoi
+    passe dans la file failed (hors du parcours du thread, purgée par la rétention).
+    """
+
+    def __init__(self, store, queue, failed):
+        self.store = store
+        self.queue = queue
+        self.failed = failed
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._executor = None
+        self._counters = {"delivered": 0, "retried": 0, "failed": 0}
+
+    def enqueue(self, url, event, payload):
+        """
+        Enregistre un envoi (à appeler dans la transaction qui termine le job).
+        """
+        now = time.time()
+        delivery_id = f"webhook_{uuid.uuid4().hex}"
+        self.queue[delivery_id] = {
+            "url": url,
+            "event": event,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now
+        }
+        return delivery_id
+
+    def wake(self):
+        """
+        Démarre le thread d'envoi si besoin et lui signale de nouveaux envois.
+        """
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Nouveau processus (fork de gunicorn) : threads et pool à recréer
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS, thread_name_prefix="webhook")
+            threading.Thread(target=self._run, name="webhooks", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                delay = self._dispatch_due()
+            except Exception as e:
+                logger.exception("Webhook dispatcher error: %s", e)
+                delay = WEBHOOK_POLL_INTERVAL
+            self._wake.wait(max(0.0, min(delay, WEBHOOK_POLL_INTERVAL)))
+
+    def _dispatch_due(self):
+        """
+        Confie au pool les envois arrivés à échéance. Retourne le délai avant le prochain.
+        """
+        now = time.time()
+        next_at = now + WEBHOOK_POLL_INTERVAL
+        cursor = None
+        while True:
+            rows, cursor = self.queue.page(after=cursor, limit=200, fields=("status", "next_attempt_at"))
+            for delivery_id, values in rows:
+                if values["status"] == "failed":
+                    self._move_failed(delivery_id)  # envoi en échec d'une version précédente
+                    continue
+                if values["next_attempt_at"] <= now:
+                    data = self._claim(delivery_id, now)
+                    if data is not None:
+                        self._executor.submit(self._deliver, delivery_id, data)
+                else:
+                    next_at = min(next_at, values["next_attempt_at"])
+            if cursor is None:
+                return next_at - now
+
+    def _claim(self, delivery_id, now):
+        with self.store.transaction():
+            data = self.queue.get(delivery_id)
+            if data is None or data["status"] == "failed" or data["next_attempt_at"] > now:
+                return None
+            data["status"] = "sending"
+            data["next_attempt_at"] = now + WEBHOOK_CLAIM_TIMEOUT
+            self.queue[delivery_id] = data
+            return data
+
+    def _move_failed(self, delivery_id):
+        with self.store.transaction():
+            data = self.queue.pop(delivery_id, None)
+            if data is not None:
+                self.failed[delivery_id] = data
+
+    def _deliver(self, delivery_id, data):
+        # Nouvelle résolution à chaque envoi : l'hôte a pu changer d'adresse depuis la validation
+        try:
+            allowed = WEBHOOK_ALLOW_PRIVATE or public_host(data["url"])
+        except OSError as e:
+            self._failed_attempt(delivery_id, data, str(e))
+            return
+        if not allowed:
+            self._failed_attempt(delivery_id, data, "callback_url resolves to a non-public address", retry=False)
+            return
+        body = json.dumps(data["payload"], ensure_ascii=False).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Event": data["event"],
+            "X-Webhook-Id": delivery_id
+        }
+        if WEBHOOK_SECRET:
+            signature = hmac.new(WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Webhook-Signature"] = f"sha256={signature}"
+        try:
+            response = get_session().post(
+                data["url"],
+                data=body,
+                headers=headers,
+                timeout=(HTTP_CONNECT_TIMEOUT, WEBHOOK_TIMEOUT),
+                allow_redirects=False
+            )
+            error = None if 200 <= response.status_code < 300 else f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+
+        if error is None:
+            self.queue.pop(delivery_id, None)
+            self._count("delivered")
+            return
+
+        self._failed_attempt(delivery_id, data, error)
+
+    def _failed_attempt(self, delivery_id, data, error, retry=True):
+        data["attempts"] += 1
+        data["last_error"] = error
+        if not retry or data["attempts"] >= WEBHOOK_MAX_ATTEMPTS:
+            data["status"] = "failed"
+            data["failed_at"] = time.time()
+            with self.store.transaction():
+                self.queue.pop(delivery_id, None)
+                self.failed[delivery_id] = data
+            self._count("failed")
+            logger.error("Webhook %s to %s failed after %s attempts: %s", data["event"], data["url"], data["attempts"], error)
+            return
+        delay = min(WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_RETRY_DELAY * 2 ** (data["attempts"] - 1))
+        data["status"] = "pending"
+        data["next_attempt_at"] = time.time() + delay
+        self._count("retried")
+        logger.warning("Webhook %s to %s failed (%s), retry in %.1fs", data["event"], data["url"], error, delay)
+        self.queue[delivery_id] = data
+        self._wake.set()  # recalculer la prochaine échéance
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"queued": len(self.queue), "failed_kept": len(self.failed), **self._counters}